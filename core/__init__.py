@@ -0,0 +1,12 @@
+"""Shared data-processing code for the Motorola automation dashboards.
+
+Modules in this package only depend on pandas (plus optional readers), so
+they can be imported without pulling in streamlit, altair, plotly or
+st_aggrid. core.batch runs the same computations from the command line:
+
+    python -m core.batch EXPORT_DIR -o reports
+
+and core.sap_ingest keeps a Parquet store of the SAP exports dropped in a folder:
+
+    python -m core.sap_ingest DROP_DIR
+"""
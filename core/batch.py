@@ -0,0 +1,151 @@
+"""Batch processing of Forge and WatchGuard exports without the dashboards.
+
+    python -m core.batch EXPORT_DIR [-o OUTPUT_DIR] [--format parquet|xlsx] [--workers N]
+
+Every Forge CSV and WatchGuard workbook/CSV in EXPORT_DIR is processed in a
+process pool. The tables each dashboard shows are written per input file
+(<name>.<table>.parquet, or one <name>.xlsx with a sheet per table), and the
+headline numbers of all files go to forge_summary and watchguard_rty. Only
+pandas and the readers are imported, never streamlit, altair, plotly or
+st_aggrid, so it starts fast enough for nightly jobs.
+"""
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from core.export import write_excel, write_parquet
+from core.forge_parser import parse_forge_report, section_summary
+from core.pareto import pareto_table
+from core.readers import CSV_EXTENSIONS
+from core.watchguard import COLUMNS, compute_family_yields, load_watchguard
+
+EXCEL_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+OUTPUT_FORMATS = ['parquet', 'xlsx']
+
+
+def detect_kind(path):
+    """'watchguard' for workbooks and CSVs with the WatchGuard columns, 'forge' for other CSVs, None otherwise."""
+    lower = path.lower()
+    if lower.endswith(EXCEL_EXTENSIONS):
+        return 'watchguard'
+    if not lower.endswith(CSV_EXTENSIONS):
+        return None
+    with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+        header = f.readline()
+    return 'watchguard' if all(column in header for column in COLUMNS) else 'forge'
+
+
+def _concat(tables, column):
+    """Stack {name: frame} into one frame with the name in `column`."""
+    frames = [frame.assign(**{column: name}) for name, frame in tables.items() if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=[column])
+    df = pd.concat(frames, ignore_index=True)
+    return df[[column] + [c for c in df.columns if c != column]]
+
+
+def forge_tables(path):
+    """Tables of the Avigilon Yield page for one Forge report."""
+    sections, rty, report_date = parse_forge_report(path)
+    summary = section_summary(sections)
+    summary.insert(0, 'Report Date', report_date)
+    summary.insert(1, 'RTY', rty)
+    failures = {name: section.failures.rename(columns={section.failures.columns[0]: 'Failure'})
+                for name, section in sections.items() if len(section.failures)}
+    return {
+        'summary': summary,
+        'yields': _concat({name: section.yields for name, section in sections.items()}, 'Section'),
+        'failures': _concat(failures, 'Section'),
+        'pareto': _concat({name: pareto_table(section.failures) for name, section in sections.items() if len(section.failures)}, 'Section'),
+    }
+
+
+def watchguard_tables(path):
+    """Tables of the WatchGuard Yield page for one test export."""
+    df, _, dropped_rows = load_watchguard(path)
+    family_yields = compute_family_yields(df)
+    rty = pd.DataFrame({'Family': list(family_yields.rty), 'RTY': list(family_yields.rty.values())})
+    rty = pd.concat([pd.DataFrame({'Family': ['Overall'], 'RTY': [family_yields.overall_rty]}), rty], ignore_index=True)
+    return {
+        'rty': rty,
+        'by_test_type': _concat(family_yields.by_test_type, 'Family'),
+        'by_product': _concat(family_yields.by_product, 'Family'),
+        'dropped_rows': dropped_rows.rename_axis('Rule').reset_index(),
+    }
+
+
+def write_tables(tables, output_dir, name, output_format):
+    if output_format == 'xlsx':
+        write_excel(tables, os.path.join(output_dir, name + '.xlsx'))
+        return
+    for table_name, df in tables.items():
+        write_parquet(df, os.path.join(output_dir, f"{name}.{table_name}.parquet"))
+
+
+def process_file(path, kind, output_dir, output_name, output_format):
+    """Process one export and write its tables; returns (headline table or None, seconds, error)."""
+    start = time.perf_counter()
+    try:
+        tables = forge_tables(path) if kind == 'forge' else watchguard_tables(path)
+        write_tables(tables, output_dir, output_name, output_format)
+        headline = tables['summary'] if kind == 'forge' else tables['rty']
+        return headline, time.perf_counter() - start, ''
+    except Exception as e:
+        return None, time.perf_counter() - start, traceback.format_exception_only(type(e), e)[-1].strip()
+
+
+def run(input_dir, output_dir, output_format='parquet', workers=None):
+    """Process every export in input_dir, files in name order; returns one status row per file."""
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for name in sorted(os.listdir(input_dir)):
+        path = os.path.join(input_dir, name)
+        kind = detect_kind(path) if os.path.isfile(path) else None
+        if kind:
+            jobs.append((path, kind))
+    stems = [os.path.splitext(os.path.basename(path))[0] for path, _ in jobs]
+    # outputs are named after the file, keep the extension when e.g. report.csv and report.xlsx are both there
+    output_names = [os.path.basename(path).replace('.', '_') if stems.count(stem) > 1 else stem for (path, _), stem in zip(jobs, stems)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(process_file, path, kind, output_dir, output_name, output_format) for (path, kind), output_name in zip(jobs, output_names)]
+        results = [future.result() for future in futures]
+
+    headlines = {'forge': {}, 'watchguard': {}}
+    status = []
+    for (path, kind), (headline, seconds, error) in zip(jobs, results):
+        name = os.path.basename(path)
+        if headline is not None:
+            headlines[kind][name] = headline
+        status.append({'File': name, 'Kind': kind, 'Seconds': round(seconds, 2), 'Error': error})
+
+    summaries = {'forge_summary': _concat(headlines['forge'], 'File'), 'watchguard_rty': _concat(headlines['watchguard'], 'File')}
+    summaries = {name: df for name, df in summaries.items() if len(df)}
+    if summaries:
+        write_tables(summaries, output_dir, 'all', output_format)
+    return status
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Turn a directory of Forge CSVs and WatchGuard exports into yield summaries.")
+    parser.add_argument('input_dir')
+    parser.add_argument('-o', '--output-dir', default='reports')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='parquet')
+    parser.add_argument('--workers', type=int, default=None, help="processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    status = run(args.input_dir, args.output_dir, args.format, args.workers)
+    for row in status:
+        print(f"{row['File']:<40} {row['Kind']:<10} {row['Seconds']:>7.2f}s {row['Error']}")
+    failed = sum(1 for row in status if row['Error'])
+    print(f"{len(status) - failed} of {len(status)} files written to {args.output_dir}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,279 @@
+"""Data access for the display bin audit table (INVENTORY_BIN_DATA).
+
+Rows are fetched in chunks of `arraysize` with fetchmany and appended straight
+into per-column lists, then turned into typed columns once. Connections come
+from a pool so reruns don't reconnect. Any DB-API connection works, a SQLite
+database with an INVENTORY_BIN_DATA table can stand in for Oracle:
+
+    BIN_AUDIT_DB=sqlite:///bin_audit.db streamlit run ...
+"""
+import json
+import os
+import queue
+import sqlite3
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from typing import NamedTuple
+
+import pandas as pd
+
+from core.part_store import PartStore
+
+DEFAULT_DSN = 'valordfmprd/oracl3@il01dbpn3:1521/VALORORA'
+TABLE = "INVENTORY_BIN_DATA"
+DB_COLUMNS = ['"WHEN"', 'PERSON', 'PART', 'QTY', 'BIN', 'STATUS'] # WHEN is a keyword, quote it
+COLUMNS = ['Date', 'Person', 'Part', 'QTY', 'Bin', 'Status']
+QUERY = f"SELECT {', '.join(DB_COLUMNS)} FROM {TABLE}"
+ARRAYSIZE = 5000
+
+
+class SQLitePool:
+    """Minimal stand-in for cx_Oracle.SessionPool over a SQLite database file."""
+    dialect = 'sqlite'
+
+    def __init__(self, path, size=4):
+        self.path = path
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return sqlite3.connect(self.path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def release(self, connection):
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+
+def open_pool(dsn=None, min_sessions=1, max_sessions=4):
+    """Open a connection pool for `dsn` (user/password@host:port/service, or sqlite:///path)."""
+    dsn = dsn or os.environ.get("BIN_AUDIT_DB", DEFAULT_DSN)
+    if dsn.startswith("sqlite:///"):
+        return SQLitePool(dsn[len("sqlite:///"):], size=max_sessions)
+    import cx_Oracle # only needed for the real database
+    credentials, _, database = dsn.partition('@')
+    user, _, password = credentials.partition('/')
+    return cx_Oracle.SessionPool(user=user, password=password, dsn=database, min=min_sessions, max=max_sessions, increment=1, threaded=True)
+
+
+@contextmanager
+def pooled_connection(pool):
+    connection = pool.acquire()
+    try:
+        yield connection
+    finally:
+        pool.release(connection)
+
+
+def to_frame(columns):
+    """Build the typed bin audit frame from per-column value lists."""
+    df = pd.DataFrame(dict(zip(COLUMNS, columns)))
+    df['Date'] = pd.to_datetime(df['Date'], errors='coerce')
+    df['QTY'] = pd.to_numeric(df['QTY'], errors='coerce')
+    for column in ['Person', 'Part', 'Bin', 'Status']:
+        df[column] = df[column].astype('string')
+    return df
+
+
+def fetch_bin_audit(connection, query=QUERY, params=None, arraysize=ARRAYSIZE):
+    """Run `query` and fetch the rows `arraysize` at a time into a typed DataFrame."""
+    cursor = connection.cursor()
+    try:
+        cursor.arraysize = arraysize
+        cursor.execute(query, params or {})
+        columns = [[] for _ in COLUMNS]
+        while True:
+            rows = cursor.fetchmany(arraysize)
+            if not rows:
+                break
+            for values, chunk in zip(columns, zip(*rows)):
+                values.extend(chunk)
+    finally:
+        cursor.close()
+    return to_frame(columns)
+
+
+# ----- incremental sync -----
+DEFAULT_SNAPSHOT_DIR = os.environ.get("BIN_AUDIT_SNAPSHOT", os.path.join(os.getcwd(), ".bin_audit"))
+DELTA_QUERY = QUERY + ' WHERE "WHEN" > :last ORDER BY "WHEN"'
+MAX_PARTS = 50 # compact the snapshot into one file past this many deltas
+
+
+class SyncResult(NamedTuple):
+    data: pd.DataFrame      # full local snapshot after the sync
+    new_rows: int           # rows pulled by this sync
+    high_water: object      # latest WHEN in the snapshot (NaT when empty)
+    synced_at: datetime     # when the database was last queried
+
+
+class BinAuditSnapshot:
+    """Local Parquet copy of INVENTORY_BIN_DATA kept up to date with small deltas.
+
+    Each sync only asks the database for rows newer than the latest WHEN already
+    stored and saves them as a new part file next to the previous ones. Rows
+    inserted later with a WHEN at or before the high-water mark are not picked
+    up; use full_refresh for that.
+    """
+    def __init__(self, directory=DEFAULT_SNAPSHOT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._parts = PartStore(directory)
+
+    def load(self):
+        snapshot = self._parts.load()
+        return to_frame([[] for _ in COLUMNS]) if snapshot is None else snapshot
+
+    def last_synced(self):
+        try:
+            with open(os.path.join(self.directory, 'sync.json')) as f:
+                return datetime.fromisoformat(json.load(f)['synced_at'])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _mark_synced(self):
+        synced_at = datetime.now()
+        with open(os.path.join(self.directory, 'sync.json'), 'w') as f:
+            json.dump({'synced_at': synced_at.isoformat()}, f)
+        return synced_at
+
+    def sync(self, connection, arraysize=ARRAYSIZE):
+        """Append the rows newer than the snapshot's high-water mark and return the snapshot."""
+        snapshot = self.load()
+        high_water = snapshot['Date'].max()
+        if pd.isna(high_water):
+            delta = fetch_bin_audit(connection, arraysize=arraysize)
+        else:
+            delta = fetch_bin_audit(connection, DELTA_QUERY, {'last': high_water.to_pydatetime()}, arraysize)
+        if len(delta):
+            self._parts.append(delta)
+            snapshot = pd.concat([snapshot, delta], ignore_index=True) if len(snapshot) else delta
+            if len(self._parts.parts()) > MAX_PARTS:
+                self._parts.compact(snapshot)
+        return SyncResult(snapshot, len(delta), snapshot['Date'].max(), self._mark_synced())
+
+    def full_refresh(self, connection, arraysize=ARRAYSIZE):
+        """Drop the snapshot and download the whole table again."""
+        self._parts.clear()
+        return self.sync(connection, arraysize)
+
+
+# ----- filtered, sorted and paged queries -----
+SORT_COLUMNS = dict(zip(COLUMNS, DB_COLUMNS)) # grid column -> database column, also the sort whitelist
+TEXT_FILTERS = [('Person', 'PERSON'), ('Part', 'PART'), ('Bin', 'BIN')]
+
+
+class BinAuditFilters(NamedTuple):
+    start: date = None      # first audit day, inclusive
+    end: date = None        # last audit day, inclusive
+    person: str = ''        # case-insensitive "contains" matches
+    part: str = ''
+    bin: str = ''
+    status: tuple = ()      # exact statuses, empty for all
+
+
+def build_where(filters):
+    """WHERE clause and bind parameters for the filters (empty clause when nothing is filtered)."""
+    clauses, params = [], {}
+    if filters.start is not None:
+        clauses.append('"WHEN" >= :start_date')
+        params['start_date'] = datetime.combine(filters.start, time.min)
+    if filters.end is not None:
+        clauses.append('"WHEN" < :end_date')
+        params['end_date'] = datetime.combine(filters.end + timedelta(days=1), time.min)
+    for field, column in TEXT_FILTERS:
+        value = getattr(filters, field.lower()).strip()
+        if value:
+            clauses.append(f"UPPER({column}) LIKE :{column.lower()}")
+            params[column.lower()] = f"%{value.upper()}%"
+    if filters.status:
+        names = [f"status{i}" for i in range(len(filters.status))]
+        clauses.append(f"STATUS IN ({', '.join(':' + name for name in names)})")
+        params.update(zip(names, filters.status))
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def build_page_query(filters, sort_by='Date', descending=True, page=0, page_size=100, dialect='oracle'):
+    """SELECT for one page of filtered rows, sorted server side."""
+    where, params = build_where(filters)
+    order = f" ORDER BY {SORT_COLUMNS[sort_by]} {'DESC' if descending else 'ASC'}"
+    if dialect == 'sqlite':
+        paging = " LIMIT :row_limit OFFSET :row_offset"
+    else:
+        paging = " OFFSET :row_offset ROWS FETCH NEXT :row_limit ROWS ONLY"
+    params.update(row_offset=page * page_size, row_limit=page_size)
+    return QUERY + where + order + paging, params
+
+
+class SQLBinAuditBackend:
+    """Runs the filters, sorting and paging in the database, only the visible page is transferred."""
+    def __init__(self, pool, dialect=None):
+        self.pool = pool
+        self.dialect = dialect or getattr(pool, 'dialect', 'oracle')
+
+    def count(self, filters):
+        where, params = build_where(filters)
+        with pooled_connection(self.pool) as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"SELECT COUNT(*) FROM {TABLE}" + where, params)
+                return cursor.fetchone()[0]
+            finally:
+                cursor.close()
+
+    def statuses(self):
+        with pooled_connection(self.pool) as connection:
+            cursor = connection.cursor()
+            try:
+                cursor.execute(f"SELECT DISTINCT STATUS FROM {TABLE} WHERE STATUS IS NOT NULL ORDER BY STATUS")
+                return [row[0] for row in cursor.fetchall()]
+            finally:
+                cursor.close()
+
+    def page(self, filters, sort_by='Date', descending=True, page=0, page_size=100):
+        query, params = build_page_query(filters, sort_by, descending, page, page_size, self.dialect)
+        with pooled_connection(self.pool) as connection:
+            return fetch_bin_audit(connection, query, params, arraysize=page_size)
+
+    def export(self, filters, sort_by='Date', descending=True):
+        """Every filtered row, for the Excel export."""
+        where, params = build_where(filters)
+        query = QUERY + where + f" ORDER BY {SORT_COLUMNS[sort_by]} {'DESC' if descending else 'ASC'}"
+        with pooled_connection(self.pool) as connection:
+            return fetch_bin_audit(connection, query, params)
+
+
+class InMemoryBinAuditBackend:
+    """Same interface as SQLBinAuditBackend over a DataFrame, used for the local snapshot and offline testing."""
+    def __init__(self, df):
+        self.df = df
+
+    def _filter(self, filters):
+        df = self.df
+        mask = pd.Series(True, index=df.index)
+        if filters.start is not None:
+            mask &= df['Date'] >= pd.Timestamp(filters.start)
+        if filters.end is not None:
+            mask &= df['Date'] < pd.Timestamp(filters.end + timedelta(days=1))
+        for field, _ in TEXT_FILTERS:
+            value = getattr(filters, field.lower()).strip()
+            if value:
+                mask &= df[field].str.upper().str.contains(value.upper(), regex=False).fillna(False).astype(bool)
+        if filters.status:
+            mask &= df['Status'].isin(filters.status)
+        return df[mask]
+
+    def count(self, filters):
+        return len(self._filter(filters))
+
+    def statuses(self):
+        return sorted(self.df['Status'].dropna().unique())
+
+    def page(self, filters, sort_by='Date', descending=True, page=0, page_size=100):
+        df = self._filter(filters).sort_values(sort_by, ascending=not descending, kind='stable')
+        return df.iloc[page * page_size:(page + 1) * page_size].reset_index(drop=True)
+
+    def export(self, filters, sort_by='Date', descending=True):
+        return self._filter(filters).sort_values(sort_by, ascending=not descending, kind='stable').reset_index(drop=True)
@@ -0,0 +1,78 @@
+"""Failure trend cube for the Avigilon error by month page.
+
+The monthly failure tables of the Forge reports are combined once into a single
+long frame: Month, Model, Failure Code, Description, Qty and the rank of the
+row's Qty within its (Model, Month). Month, Model and Failure Code are
+categoricals. The top N failures per model and month are then a filter on the
+Rank column, no per-model or per-month frames are rebuilt.
+
+Months are YYYY-MM keys taken from the report date, ordered chronologically,
+so reports from several years don't overwrite each other. Each month is built
+on its own by month_failures and combine_months only concatenates them, adding
+a report only builds that report's rows.
+"""
+import pandas as pd
+
+FAILURE_SECTION = "Forge Inspection"
+CUBE_COLUMNS = ['Month', 'Model', 'Failure Code', 'Description', 'Qty', 'Rank']
+
+
+def report_month(report_date):
+    """YYYY-MM key of a Forge report date such as 'Monday, January 09, 2023', None when it can't be read."""
+    date = pd.to_datetime(report_date, errors='coerce')
+    return None if pd.isna(date) else f"{date:%Y-%m}"
+
+
+def month_failures(month, failures):
+    """Cube rows of one month's failure table, the (<section> Failures, Model, [Convert], Qty) frame of a Forge report."""
+    rows = pd.DataFrame({
+        'Month': month,
+        'Model': failures['Model'].astype(str).to_numpy(),
+        'Description': failures.iloc[:, 0].to_numpy(),
+        'Qty': pd.to_numeric(failures['Qty'], errors='coerce').fillna(0).astype('int64').to_numpy(),
+    })
+    rows['Failure Code'] = rows['Description'].astype(str).str.split(":", n=1).str[0] # Canceled by operator, just grab "Canceled"
+    # report order breaks ties, like taking the first N rows of each table
+    rows['Rank'] = rows.groupby('Model')['Qty'].rank(method='first', ascending=False).astype('int64')
+    return rows[CUBE_COLUMNS]
+
+
+def combine_months(pieces):
+    """Failure cube from month_failures pieces, months in chronological order (a later piece of the same month wins)."""
+    by_month = {}
+    for piece in pieces:
+        if len(piece):
+            by_month[piece['Month'].iloc[0]] = piece
+    if not by_month:
+        return pd.DataFrame({column: pd.Series(dtype='category' if column in ('Month', 'Model', 'Failure Code') else 'int64')
+                             for column in CUBE_COLUMNS}).astype({'Description': object})
+    months = sorted(by_month)
+    cube = pd.concat([by_month[month] for month in months], ignore_index=True)
+    cube['Month'] = pd.Categorical(cube['Month'], categories=months, ordered=True)
+    cube['Model'] = cube['Model'].astype('category')
+    cube['Failure Code'] = cube['Failure Code'].astype('category')
+    return cube
+
+
+def build_failure_cube(monthly_failures):
+    """Long-format failure cube from {YYYY-MM: failure table}."""
+    return combine_months(month_failures(month, failures) for month, failures in monthly_failures.items())
+
+
+def last_months(cube, months=None):
+    """Rows of the `months` calendar months up to the cube's latest month, all of them when months is None.
+
+    Months without a report still count, so the window never reaches further
+    back than `months` months.
+    """
+    if months is None or len(cube) == 0:
+        return cube
+    latest = pd.Period(cube['Month'].cat.categories[-1], 'M')
+    cutoff = f"{latest - (months - 1)}" # YYYY-MM keys sort like the months they name
+    window = [month for month in cube['Month'].cat.categories if month >= cutoff]
+    return cube[cube['Month'].isin(window)]
+
+
+def top_failures(cube, n):
+    """Top n failures of every model in every month."""
+    return cube[cube['Rank'] <= n]
@@ -0,0 +1,141 @@
+"""Export of result tables to Excel, CSV or Parquet files.
+
+Workbooks are written with xlsxwriter's constant_memory mode straight to a
+temporary file, row by row, so the workbook is never held in memory next to
+the DataFrames and a BytesIO copy of it. Several tables exported as CSV or
+Parquet are zipped, one file per table.
+"""
+import os
+import tempfile
+import time
+import zipfile
+
+import xlsxwriter
+
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "motorola_automation_exports")
+MAX_AGE = 60 * 60 # seconds an export file is kept before it is cleaned up
+CHUNK_ROWS = 10000
+
+EXPORT_FORMATS = ['Excel', 'CSV', 'Parquet']
+EXTENSIONS = {'Excel': '.xlsx', 'CSV': '.csv', 'Parquet': '.parquet'}
+MIME_TYPES = {
+    'Excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'CSV': 'text/csv',
+    'Parquet': 'application/octet-stream',
+    'zip': 'application/zip',
+}
+
+
+def _new_path(suffix):
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    now = time.time()
+    for name in os.listdir(EXPORT_DIR): # drop exports nobody downloaded
+        path = os.path.join(EXPORT_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > MAX_AGE:
+                os.remove(path)
+        except OSError:
+            pass
+    handle, path = tempfile.mkstemp(suffix=suffix, dir=EXPORT_DIR)
+    os.close(handle)
+    return path
+
+
+def write_excel(sheets, path, column_formats=None):
+    """Write {sheet name: DataFrame} to an xlsx file in constant memory mode.
+
+    column_formats maps a column name to an Excel number format, e.g. {'QTY': '0.00'}.
+    """
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'default_date_format': 'mm/dd/yyyy hh:mm:ss',
+        'nan_inf_to_errors': True,
+    })
+    try:
+        header_format = workbook.add_format({'bold': True, 'border': 1})
+        formats = {column: workbook.add_format({'num_format': number_format}) for column, number_format in (column_formats or {}).items()}
+        for sheet_name, df in sheets.items():
+            worksheet = workbook.add_worksheet(str(sheet_name)[:31]) # excel limits sheet names to 31 characters
+            for col, column in enumerate(df.columns):
+                if column in formats:
+                    worksheet.set_column(col, col, None, formats[column])
+            worksheet.write_row(0, 0, [str(column) for column in df.columns], header_format)
+            row = 1
+            # rows must be written in order in constant memory mode, convert a chunk at a time
+            for start in range(0, len(df), CHUNK_ROWS):
+                chunk = df.iloc[start:start + CHUNK_ROWS]
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+                for values in chunk.itertuples(index=False, name=None):
+                    worksheet.write_row(row, 0, values)
+                    row += 1
+    finally:
+        workbook.close()
+    return path
+
+
+def write_parquet(df, path):
+    """Write a DataFrame to a Parquet file; object columns are written as text, missing values stay null."""
+    text_columns = df.select_dtypes(include='object').columns
+    df.astype({column: 'string' for column in text_columns}).to_parquet(path, index=False) # mixed object columns can't go to parquet as is
+    return path
+
+
+def export_file(sheets, export_format='Excel', column_formats=None):
+    """Write the tables to a temporary file in the given format.
+
+    Returns (path, extension, mime type). A single table exported as CSV or
+    Parquet is written as is, several tables are zipped.
+    """
+    if export_format == 'Excel':
+        return write_excel(sheets, _new_path('.xlsx'), column_formats), '.xlsx', MIME_TYPES['Excel']
+
+    extension = EXTENSIONS[export_format]
+
+    def write(df, path):
+        if export_format == 'CSV':
+            df.to_csv(path, index=False)
+        else:
+            write_parquet(df, path)
+
+    if len(sheets) == 1:
+        path = _new_path(extension)
+        write(next(iter(sheets.values())), path)
+        return path, extension, MIME_TYPES[export_format]
+
+    path = _new_path('.zip')
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for sheet_name, df in sheets.items():
+            member = _new_path(extension)
+            try:
+                write(df, member)
+                archive.write(member, f"{sheet_name}{extension}")
+            finally:
+                os.remove(member)
+    return path, '.zip', MIME_TYPES['zip']
+
+
+def find_export(key):
+    """Path, extension and mime type of an export already written for `key`, or None."""
+    if not os.path.isdir(EXPORT_DIR):
+        return None
+    for extension, mime in [('.xlsx', MIME_TYPES['Excel']), ('.csv', MIME_TYPES['CSV']), ('.parquet', MIME_TYPES['Parquet']), ('.zip', MIME_TYPES['zip'])]:
+        path = os.path.join(EXPORT_DIR, key + extension)
+        if os.path.exists(path):
+            os.utime(path) # keep it around while it is being downloaded
+            return path, extension, mime
+    return None
+
+
+def keyed_export(key, build_sheets, export_format='Excel'):
+    """Export stored under `key` (e.g. a hash of the upload and the format), built only if missing.
+
+    build_sheets is only called when there is no export for the key yet, so the
+    tables are not collected and the file is not written again for a repeated download.
+    """
+    found = find_export(key)
+    if found:
+        return found
+    path, extension, mime = export_file(build_sheets(), export_format)
+    target = os.path.join(EXPORT_DIR, key + extension)
+    os.replace(path, target)
+    return target, extension, mime
@@ -0,0 +1,205 @@
+"""Single pass parser for the Avigilon Forge CSV report.
+
+The Forge export is one CSV holding six stacked sections. Each section has a
+"textbox" row (next row is the totals), a "report_group" row (yield table
+below it) and a "failuremode*" row (failure table below it). Instead of loading
+the whole file into an object DataFrame and searching it, one regex scan over
+the text finds the marker lines and the lines between two markers are read
+as a table with pandas' C csv parser.
+"""
+import csv
+import io
+import os
+import re
+from typing import NamedTuple
+
+import pandas as pd
+
+SECTIONS = ["Forge Set-Parameters", "Forge Burn-in", "Forge Inspection", "Forge Eyeball Lens-Tuning", "Forge Lens-Tuning", "Forge Base-Programming"]
+
+FAILURE_HEADERS = {
+    "failuremode3": "Set-Parameters Failures",
+    "failuremode": "Burn-in Failures",
+    "failuremode2": "Inspection Failures",
+    "failuremode4": "Eyeball Lens-Tuning Failures",
+    "failuremode1": "Lens-Tuning Failures",
+    "failuremode5": "Base-Programming Failures",
+}
+
+# section markers looked up in the first column, in the order they are tested
+TOTAL_MARKER = "textbox"
+YIELD_MARKER = "report_group"
+FAILURE_MARKER = "failure"
+
+PARSER_VERSION = 1 # bump when the parsed output changes, invalidates the parse cache
+
+COUNT_COLUMNS = ['Total', 'Passed', 'Failed', 'Qty']
+
+
+class ForgeSection(NamedTuple):
+    total: pd.DataFrame     # one row: Yield (or Sudo-Yield), Total, Passed, Failed
+    yields: pd.DataFrame    # Model, [Convert], Total, Passed, Failed, Yield
+    failures: pd.DataFrame  # <section> Failures, Model, [Convert], Qty
+
+
+class ForgeReport(NamedTuple):
+    sections: dict          # section name -> ForgeSection
+    rty: str                # Rolled Throughput Yield
+    report_date: str
+
+
+def _read_text(source):
+    """Decoded text of a path, raw bytes or a binary/text file object."""
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, newline='', encoding='utf-8-sig') as f:
+            return f.read()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source).decode('utf-8-sig')
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    text = source.read()
+    return text.decode('utf-8-sig') if isinstance(text, bytes) else text
+
+
+# a line whose first cell holds one of the markers, matched case insensitively like the markers
+MARKER_LINE = re.compile(rf'^"?([^,"\r\n]*(?:{TOTAL_MARKER}|{YIELD_MARKER}|{FAILURE_MARKER})[^,"\r\n]*)', re.MULTILINE | re.IGNORECASE)
+FIRST_LINE = re.compile(r'^.*\S.*$', re.MULTILINE) # first non blank line
+
+
+def _marker(cell):
+    cell = cell.lower()
+    for marker in (TOTAL_MARKER, YIELD_MARKER, FAILURE_MARKER):
+        if marker in cell:
+            return marker
+    return None
+
+
+def _build_frame(text, width, nrows=None):
+    """Read a table's csv lines with the C parser, dropping columns that are blank in every row."""
+    if not text.strip():
+        return pd.DataFrame()
+    df = pd.read_csv(io.StringIO(text), header=None, names=range(width), usecols=range(width), nrows=nrows, dtype=str, keep_default_na=False)
+    df = df[[column for column in df.columns if df[column].ne('').any()]]
+    df.columns = range(len(df.columns))
+    return df
+
+
+def _to_numbers(df):
+    """Cast the count columns to integers, leaving formatted values (Yield, Convert) as text."""
+    for column in COUNT_COLUMNS:
+        if column in df.columns:
+            # converted on the distinct values only, the counts repeat a lot
+            codes, uniques = pd.factorize(df[column])
+            numbers = pd.to_numeric(pd.Series(uniques, dtype=object).str.replace(',', '', regex=False).str.strip(), errors='coerce')
+            values = pd.Series(numbers.to_numpy()[codes], index=df.index)
+            df[column] = values.astype('int64') if values.notna().all() else values.astype('Int64')
+    return df
+
+
+def _total_frame(text, width, section):
+    section_total = _build_frame(text, width, nrows=1) # only the row right below "textbox" holds the totals
+    if section_total.empty or len(section_total.columns) != 4:
+        return pd.DataFrame() # empty dataframe if no data
+    if section != "Forge Base-Programming":
+        section_total.columns = ['Yield', 'Total', 'Passed', 'Failed']
+    else:
+        section_total.columns = ['Sudo-Yield', 'Total', 'Passed', 'Failed']
+    return _to_numbers(section_total)
+
+
+def _yield_frame(text, width):
+    section_yield = _build_frame(text, width)
+    if len(section_yield.columns) == 5:
+        section_yield.columns = ['Model', 'Total', 'Passed', 'Failed', 'Yield']
+    elif len(section_yield.columns) == 6:
+        section_yield.columns = ['Model', 'Convert', 'Total', 'Passed', 'Failed', 'Yield']
+    return _to_numbers(section_yield)
+
+
+def _failure_frame(text, width, table_header):
+    section_failures = _build_frame(text, width)
+    header = FAILURE_HEADERS.get(table_header.strip().lower(), table_header.strip())
+    if len(section_failures.columns) == 3: # only 3 columns (failures, model, qty)
+        section_failures.columns = [header, 'Model', 'Qty']
+    elif len(section_failures.columns) == 4: # 4 columns (failures, model, convert, qty)
+        section_failures.columns = [header, 'Model', 'Convert', 'Qty']
+    return _to_numbers(section_failures)
+
+
+def parse_forge_report(source):
+    """Parse a Forge CSV report in one pass.
+
+    Parameters
+    ----------
+    source:
+        path, bytes or file object (e.g. a streamlit UploadedFile) of the report.
+
+    Returns a ForgeReport(sections, rty, report_date); sections maps each name
+    in SECTIONS to a ForgeSection(total, yields, failures).
+    """
+    text = _read_text(source)
+    header_end = text.find('\n') + 1 or len(text)
+    if not text[:header_end].strip():
+        raise ValueError("Forge report is empty")
+    width = len(next(csv.reader([text[:header_end]])))
+
+    rty = report_date = None
+    first_line = FIRST_LINE.search(text, header_end)
+    if first_line:
+        row = next(csv.reader([first_line.group()]))
+        rty = row[3] if len(row) > 3 else None # Rolled Throughput Yield
+        report_date = row[4] if len(row) > 4 else None
+
+    counters = {TOTAL_MARKER: 0, YIELD_MARKER: 0, FAILURE_MARKER: 0}
+    frames = {section: [pd.DataFrame(), pd.DataFrame(), pd.DataFrame()] for section in SECTIONS}
+
+    def flush(current, table):
+        marker, i, cell = current
+        if i >= len(SECTIONS):
+            return
+        section = SECTIONS[i]
+        if marker == TOTAL_MARKER:
+            frames[section][0] = _total_frame(table, width, section)
+        elif marker == YIELD_MARKER:
+            frames[section][1] = _yield_frame(table, width)
+        else:
+            frames[section][2] = _failure_frame(table, width, cell)
+
+    # one regex scan finds the marker lines, the text between two markers is the table below the first one
+    current = None # (marker, section index, marker cell) of the table being collected
+    table_start = header_end
+    for match in MARKER_LINE.finditer(text, header_end):
+        if current is not None:
+            flush(current, text[table_start:match.start()])
+        marker = _marker(match.group(1))
+        current = (marker, counters[marker], match.group(1))
+        counters[marker] += 1
+        table_start = text.find('\n', match.end()) + 1 or len(text)
+    if current is not None:
+        flush(current, text[table_start:])
+
+    sections = {section: ForgeSection(*frames[section]) for section in SECTIONS}
+    return ForgeReport(sections, rty, report_date)
+
+
+def parse_forge_failures(source):
+    """Failure tables of a Forge report, ({section: failures}, report_date), for the error by month page."""
+    sections, rty, report_date = parse_forge_report(source)
+    return {section: tables.failures for section, tables in sections.items()}, report_date
+
+
+def section_summary(sections):
+    """One row per section with its yield and counts, from the section totals (empty sections are left out)."""
+    rows = []
+    for name, section in sections.items():
+        total = section.total
+        if total.empty:
+            continue
+        rows.append({
+            'Section': name,
+            'Yield': total.iloc[0, 0], # Yield, or Sudo-Yield for Base-Programming
+            'Total': total['Total'].iloc[0],
+            'Passed': total['Passed'].iloc[0],
+            'Failed': total['Failed'].iloc[0],
+        })
+    return pd.DataFrame(rows, columns=['Section', 'Yield', 'Total', 'Passed', 'Failed'])
@@ -0,0 +1,125 @@
+"""Parallel parsing of several uploaded files.
+
+parse_files hashes every upload, serves the ones already in the parse cache and
+parses the rest in a process pool (Excel and CSV parsing holds the GIL, threads
+don't help). Results come back in upload order with the parse time and the
+error of each file, a file that fails doesn't stop the others.
+
+The parse function runs in another process: it has to be importable from a
+core module (not defined in a page) and its result picklable. The workers are
+spawned once and reused; INGEST_WORKERS=1 parses in process.
+"""
+import io
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
+
+from core.parse_cache import content_key, get_parse_cache, read_bytes
+from core.readers import source_name
+
+MAX_WORKERS = int(os.environ.get("INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+
+
+class IngestResult(NamedTuple):
+    name: str               # file name of the upload
+    result: object          # parse result, None when it failed
+    seconds: float          # parse time, 0 when served from the cache
+    cached: bool
+    error: str = ''         # last line of the exception when the parse failed
+    key: str = ''           # content key of the upload, identifies it in other cache keys
+
+
+class _NamedBytes(io.BytesIO):
+    """Upload bytes with the file name, readers pick csv or Excel from it."""
+    def __init__(self, data, name):
+        super().__init__(data)
+        self.name = name
+
+
+def _run(parse, name, data):
+    start = time.perf_counter()
+    try:
+        return parse(_NamedBytes(data, name)), time.perf_counter() - start, ''
+    except Exception as e:
+        return None, time.perf_counter() - start, traceback.format_exception_only(type(e), e)[-1].strip()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Process pool shared by every session, spawned (not forked) since the app server runs threads."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def parse_files(files, parser_name, version, parse, cache=None):
+    """Parse each file with `parse`, in parallel, through the parse cache.
+
+    Parameters
+    ----------
+    files:
+        paths or file objects (e.g. streamlit UploadedFiles).
+    parser_name, version:
+        parse cache key, as for cached_parse.
+    parse:
+        module level function taking a file object.
+
+    Returns a list of IngestResult in the order of `files`.
+    """
+    cache = cache or get_parse_cache()
+    results = [None] * len(files)
+    pending = []
+    duplicates = [] # (index, index of the same content) uploaded twice in one batch
+    seen = {}
+    for i, source in enumerate(files):
+        name = os.path.basename(source_name(source))
+        data = read_bytes(source)
+        key = content_key(data, parser_name, version)
+        if key in seen:
+            duplicates.append((i, seen[key]))
+            continue
+        seen[key] = i
+        result = cache.get(key)
+        if result is not None:
+            results[i] = IngestResult(name, result, 0.0, True, key=key)
+        else:
+            pending.append((i, name, data, key))
+
+    if len(pending) > 1 and MAX_WORKERS > 1:
+        try:
+            futures = [(i, name, key, get_executor().submit(_run, parse, name, data)) for i, name, data, key in pending]
+            parsed = [(i, name, key, future.result()) for i, name, key, future in futures]
+        except BrokenProcessPool: # a worker died (e.g. out of memory), parse in process and start a new pool next time
+            _reset_executor()
+            parsed = [(i, name, key, _run(parse, name, data)) for i, name, data, key in pending]
+    else: # a single file isn't worth the trip to another process
+        parsed = [(i, name, key, _run(parse, name, data)) for i, name, data, key in pending]
+
+    for i, name, key, (result, seconds, error) in parsed:
+        if not error:
+            cache.put(key, result)
+        results[i] = IngestResult(name, result, seconds, False, error, key)
+    for i, first in duplicates:
+        results[i] = results[first]._replace(name=os.path.basename(source_name(files[i])), seconds=0.0)
+    return results
+
+
+def timing_table(results):
+    """Rows of (file, seconds, cached, error) for display."""
+    return [{'File': r.name, 'Seconds': round(r.seconds, 2), 'Cached': r.cached, 'Error': r.error} for r in results]
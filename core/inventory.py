@@ -0,0 +1,246 @@
+"""SAP vs 3PL inventory reconciliation.
+
+storage_unit and material are factorized into integer codes once, over SAP,
+3PL and the non-inventory list together. Every comparison the page shows
+(storage unit only, storage unit + material, storage unit + material +
+quantity, quantity mismatches, 3PL fixed, non-inventory) is then a lookup in
+boolean presence arrays indexed by those codes instead of a separate outer merge.
+
+Keys are normalized first: storage units and materials become trimmed upper
+case strings (a 123.0 read from Excel becomes '123') stored as categoricals
+sharing one set of categories on both sides, quantities become nullable
+Int64. Rows whose keys can't be read are reported and left out of the
+comparisons. Rows whose quantity can't be read are reported too but keep their
+keys, with an NA quantity, and are only left out of the quantity comparisons.
+"""
+import importlib.util
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+KEY_COLUMNS = ['storage_unit', 'material']
+QUANTITY_COLUMN = 'available_stock'
+INVALID_COLUMNS = ['source', 'row', 'column', 'value']
+SAP_SELECTOR = {'storage unit': 'storage_unit', 'material': 'material', 'available stock': 'available_stock'} # select columns from SAP data and rename
+PL_SELECTOR = {'hawb': 'storage_unit', 'sku': 'material', 'movable unit label': 'available_stock'} # 3PL columns matching the SAP ones
+# pyarrow strings run strip/upper/replace in C, the python-backed 'string' dtype goes element by element
+STRING_DTYPE = 'string[pyarrow]' if importlib.util.find_spec("pyarrow") is not None else 'string'
+
+
+class Reconciliation(NamedTuple):
+    sap: pd.DataFrame                       # normalized SAP storage_unit, material, available_stock
+    pl: pd.DataFrame                        # normalized 3PL storage_unit, material, available_stock
+    invalid_rows: pd.DataFrame              # values that couldn't be read, one row per value
+    matching_codes: pd.DataFrame            # storage units in both
+    sap_only_codes: pd.DataFrame            # SAP rows whose storage unit is not in 3PL
+    pl_only_codes: pd.DataFrame             # 3PL rows whose storage unit is not in SAP
+    matching_codes_material: pd.DataFrame   # storage unit + material in both
+    sap_only_codes_material: pd.DataFrame
+    pl_only_codes_material: pd.DataFrame
+    both: pd.DataFrame                      # storage unit + material + quantity in both
+    sap_only: pd.DataFrame                  # SAP rows with no identical 3PL row
+    pl_only: pd.DataFrame                   # 3PL rows with no identical SAP row
+    quantity_mismatch: pd.DataFrame         # same storage unit + material, different quantity
+    pl_fixed: pd.DataFrame                  # 3PL data with the moveable unit label replaced by the SAP quantity
+    ni_not_in_pl: pd.DataFrame              # non-inventory codes that are not in 3PL
+    pl_not_in_ni: pd.DataFrame              # 3PL codes that are not in the non-inventory list
+
+
+def _canonical_uniques(uniques):
+    keys = pd.Series(uniques, dtype=object).astype(str).astype(STRING_DTYPE).str.strip().str.upper()
+    keys = keys.str.replace(r'^(\d+)\.0+$', r'\1', regex=True)
+    return keys.mask(keys == '').astype('string')
+
+
+def canonical_keys(values):
+    """Trimmed upper case string keys, whole numbers read as floats lose their '.0', blanks become NA.
+
+    The string work runs on the distinct values only and is mapped back
+    through the factorized codes, key columns repeat the same codes a lot.
+    """
+    codes, uniques = pd.factorize(values)
+    keys = _canonical_uniques(uniques)
+    return pd.Series(keys.array.take(codes, allow_fill=True), index=values.index, name=values.name) # code -1 (missing) becomes NA
+
+
+def shared_key_categories(*columns):
+    """canonical_keys of the columns as categoricals of one dtype, from a single factorize over all of them.
+
+    Only the distinct values go through the string work; their codes are
+    then remapped, so SAP and 3PL codes can be compared directly.
+    """
+    codes, uniques = pd.factorize(pd.concat(columns, ignore_index=True))
+    key_codes, categories = pd.factorize(_canonical_uniques(uniques)) # ' a' and 'A' become the same category
+    codes = np.where(codes < 0, -1, key_codes[codes]) if len(key_codes) else codes
+    dtype = pd.CategoricalDtype(categories)
+    splits = np.cumsum([len(column) for column in columns])[:-1]
+    return [pd.Series(pd.Categorical.from_codes(part, dtype=dtype), index=column.index, name=column.name)
+            for part, column in zip(np.split(codes, splits), columns)]
+
+
+def canonical_quantities(values):
+    """Quantities as nullable Int64 and a mask of the values that were given but aren't whole numbers."""
+    numbers = pd.to_numeric(values, errors='coerce')
+    invalid = (numbers.isna() & values.notna()) | (numbers.notna() & (numbers % 1 != 0))
+    return numbers.mask(invalid).astype('Int64'), invalid
+
+
+def normalize(df, source, keys=None):
+    """Normalize the key and quantity columns of a selected frame.
+
+    keys are the already normalized key columns ({column: categorical}, see
+    shared_key_categories), computed here when not given. Returns the
+    normalized frame without the rows whose keys can't be read (an unreadable
+    quantity becomes NA), and the unreadable values in long format (source,
+    row, column, original value).
+    """
+    keys = keys or {column: shared_key_categories(df[column])[0] for column in KEY_COLUMNS}
+    normalized = df.copy()
+    invalid = {}
+    for column in KEY_COLUMNS:
+        normalized[column] = keys[column]
+        invalid[column] = normalized[column].isna()
+    normalized[QUANTITY_COLUMN], invalid[QUANTITY_COLUMN] = canonical_quantities(df[QUANTITY_COLUMN])
+    invalid = pd.DataFrame(invalid)[[*KEY_COLUMNS, QUANTITY_COLUMN]]
+    rows, columns = np.nonzero(invalid.to_numpy())
+    report = pd.DataFrame({
+        'source': source,
+        'row': df.index[rows],
+        'column': invalid.columns[columns],
+        'value': pd.array(df[invalid.columns].to_numpy()[rows, columns].astype(str), dtype='string'), # mixed types, kept as text
+    }, columns=INVALID_COLUMNS)
+    return normalized[~invalid[KEY_COLUMNS].any(axis=1)], report
+
+
+def _factorize(*columns):
+    """Integer codes shared by all the given columns, missing values get a code of their own."""
+    if all(isinstance(column.dtype, pd.CategoricalDtype) and column.dtype == columns[0].dtype for column in columns):
+        codes = np.concatenate([column.cat.codes.to_numpy() for column in columns])
+        size = len(columns[0].cat.categories)
+    else:
+        codes, uniques = pd.factorize(pd.concat(columns, ignore_index=True))
+        size = len(uniques)
+    codes = np.where(codes < 0, size, codes)
+    size = size + 1
+    splits = np.cumsum([len(column) for column in columns])[:-1]
+    return np.split(codes, splits), size
+
+
+def _combine(left, right, right_size):
+    """Codes of (left, right) pairs, re-factorized so they stay small."""
+    pairs = left.astype(np.int64) * right_size + right
+    codes, uniques = pd.factorize(pairs)
+    return codes, len(uniques)
+
+
+def _present(codes, size):
+    present = np.zeros(size, dtype=bool)
+    present[codes] = True
+    return present
+
+
+def _split(sap_codes, pl_codes, size):
+    """Masks of SAP rows found in 3PL, 3PL rows found in SAP, and the codes found in both."""
+    in_sap = _present(sap_codes, size)
+    in_pl = _present(pl_codes, size)
+    return in_pl[sap_codes], in_sap[pl_codes], in_sap & in_pl
+
+
+def select_columns(SAP_data, PL_data):
+    """SAP and 3PL frames with the storage_unit, material and available_stock columns."""
+    SAP_df = SAP_data.rename(columns=SAP_SELECTOR)[[*SAP_SELECTOR.values()]]
+    PL_df = PL_data.rename(columns=PL_SELECTOR)[[*PL_SELECTOR.values()]]
+    return SAP_df, PL_df
+
+
+def reconcile(SAP_data, PL_data, non_inventory_data=None):
+    """Compare the SAP and 3PL snapshots (column names already cleaned and lower case)."""
+    SAP_df, PL_df = select_columns(SAP_data, PL_data)
+    keys = {column: shared_key_categories(SAP_df[column], PL_df[column]) for column in KEY_COLUMNS}
+    SAP_df, sap_invalid = normalize(SAP_df, 'SAP', {column: sap for column, (sap, _) in keys.items()})
+    PL_df, pl_invalid = normalize(PL_df, '3PL', {column: pl for column, (_, pl) in keys.items()})
+
+    (sap_su, pl_su), su_size = _factorize(SAP_df['storage_unit'], PL_df['storage_unit'])
+    (sap_mat, pl_mat), mat_size = _factorize(SAP_df['material'], PL_df['material'])
+    (sap_qty, pl_qty), qty_size = _factorize(SAP_df['available_stock'], PL_df['available_stock'])
+
+    pair_codes, pair_size = _combine(np.concatenate([sap_su, pl_su]), np.concatenate([sap_mat, pl_mat]), mat_size)
+    sap_pair, pl_pair = pair_codes[:len(SAP_df)], pair_codes[len(SAP_df):]
+    triple_codes, triple_size = _combine(pair_codes, np.concatenate([sap_qty, pl_qty]), qty_size)
+    sap_triple, pl_triple = triple_codes[:len(SAP_df)], triple_codes[len(SAP_df):]
+
+    # ===== storage unit codes only =====
+    sap_has_su, pl_has_su, _ = _split(sap_su, pl_su, su_size)
+    # ===== storage unit codes and material number =====
+    sap_has_pair, pl_has_pair, _ = _split(sap_pair, pl_pair, pair_size)
+    # ===== storage unit codes, material number and quantity =====
+    # rows with an unreadable quantity take no part in this or the quantity mismatches
+    sap_has_qty = SAP_df[QUANTITY_COLUMN].notna().to_numpy()
+    pl_has_qty = PL_df[QUANTITY_COLUMN].notna().to_numpy()
+    sap_has_triple = _present(pl_triple[pl_has_qty], triple_size)[sap_triple] & sap_has_qty
+    pl_has_triple = _present(sap_triple[sap_has_qty], triple_size)[pl_triple] & pl_has_qty
+    sap_unmatched = ~sap_has_triple & sap_has_qty
+    pl_unmatched = ~pl_has_triple & pl_has_qty
+
+    sap_only = SAP_df[sap_unmatched].reset_index(drop=True)
+    pl_only = PL_df[pl_unmatched].reset_index(drop=True)
+
+    # same storage unit and material on both sides but none with the same quantity
+    sap_unmatched_pairs = pd.DataFrame({'pair': sap_pair[sap_unmatched], 'sap_row': np.flatnonzero(sap_unmatched)})
+    pl_unmatched_pairs = pd.DataFrame({'pair': pl_pair[pl_unmatched], 'pl_row': np.flatnonzero(pl_unmatched)})
+    mismatch_rows = sap_unmatched_pairs.merge(pl_unmatched_pairs, on='pair') # small integer join over the unmatched rows only
+    quantity_mismatch = SAP_df.iloc[mismatch_rows['sap_row']].reset_index(drop=True)
+    quantity_mismatch = quantity_mismatch.rename(columns={QUANTITY_COLUMN: 'sap_available_stock'})
+    quantity_mismatch['3pl_available_stock'] = PL_df[QUANTITY_COLUMN].iloc[mismatch_rows['pl_row']].array
+
+    # 3PL FIXED: 3PL moveable unit label replaced with the SAP available stock of the same storage unit and material
+    sap_stock_by_pair = pd.Series(SAP_df[QUANTITY_COLUMN].array[sap_has_qty], index=sap_pair[sap_has_qty])
+    sap_stock_by_pair = sap_stock_by_pair[~sap_stock_by_pair.index.duplicated()]
+    pl_fixed = PL_data.drop(columns=['movable unit label'])
+    pl_fixed['moveable unit label FIXED'] = pd.Series(sap_stock_by_pair.reindex(pl_pair).array, index=PL_df.index) # rows left out get NA
+    pl_fixed = pl_fixed.reset_index(drop=True)
+
+    # non-inventory codes against the 3PL storage units
+    ni_not_in_pl = pl_not_in_ni = pd.DataFrame(columns=['storage_unit'])
+    if non_inventory_data is not None and len(non_inventory_data):
+        ni_codes = canonical_keys(non_inventory_data['storage_unit']).dropna()
+        PL_codes = PL_df['storage_unit'].astype('string') # get 3PL storage unit codes
+        (ni_codes_idx, pl_codes_idx), code_size = _factorize(ni_codes, PL_codes)
+        ni_in_pl, pl_in_ni, _ = _split(ni_codes_idx, pl_codes_idx, code_size)
+        ni_not_in_pl = ni_codes[~ni_in_pl].drop_duplicates().to_frame().reset_index(drop=True)
+        pl_not_in_ni = PL_codes[~pl_in_ni].drop_duplicates().to_frame().reset_index(drop=True)
+
+    return Reconciliation(
+        sap=SAP_df.reset_index(drop=True),
+        pl=PL_df.reset_index(drop=True),
+        invalid_rows=pd.concat([sap_invalid, pl_invalid], ignore_index=True),
+        matching_codes=SAP_df.loc[sap_has_su, ['storage_unit']].drop_duplicates().reset_index(drop=True),
+        sap_only_codes=SAP_df.loc[~sap_has_su, ['storage_unit']].reset_index(drop=True),
+        pl_only_codes=PL_df.loc[~pl_has_su, ['storage_unit']].reset_index(drop=True),
+        matching_codes_material=SAP_df.loc[sap_has_pair, KEY_COLUMNS].drop_duplicates().reset_index(drop=True),
+        sap_only_codes_material=SAP_df.loc[~sap_has_pair, KEY_COLUMNS].reset_index(drop=True),
+        pl_only_codes_material=PL_df.loc[~pl_has_pair, KEY_COLUMNS].reset_index(drop=True),
+        both=SAP_df[sap_has_triple].drop_duplicates().reset_index(drop=True),
+        sap_only=sap_only,
+        pl_only=pl_only,
+        quantity_mismatch=quantity_mismatch,
+        pl_fixed=pl_fixed,
+        ni_not_in_pl=ni_not_in_pl,
+        pl_not_in_ni=pl_not_in_ni,
+    )
+
+
+def export_sheets(result, SAP_data, PL_data):
+    """Sheets of the Excel export, raw uploads first."""
+    return {
+        'SAP Data': SAP_data,
+        '3PL Data': PL_data,
+        'SAP ONLY': result.sap_only,
+        '3PL ONLY': result.pl_only,
+        '3PL vs SAP': result.quantity_mismatch,
+        '3PL FIXED': result.pl_fixed,
+        'NI Codes not in 3PL': result.ni_not_in_pl,
+        '3PL Codes not in NI': result.pl_not_in_ni,
+        'Invalid Rows': result.invalid_rows,
+    }
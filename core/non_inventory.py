@@ -0,0 +1,139 @@
+"""Non-inventory storage unit list kept in the 'OFFSITE Non-Inventory' Google Sheet.
+
+NonInventoryList reuses one client, serves the list from memory for `ttl`
+seconds and then only asks Drive for the sheet's modifiedTime; the values are
+downloaded again only when the sheet changed. Every download is saved to a
+JSON snapshot on disk, which is served when the API is slow or unavailable.
+
+Anything with modified_time(spreadsheet_id) and values(spreadsheet_id, range)
+can be passed as the client, StaticSheetsClient serves fixed rows offline.
+"""
+import json
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import pandas as pd
+
+SPREADSHEET_ID = '16OzdGvKSDwbkG5F_fZVxFjB4fdZuoD1krGdU_iMZErU'
+RANGE = "'OFFSITE Non-Inventory'!A2:A"
+SCOPES = ["https://www.googleapis.com/auth/drive", "https://www.googleapis.com/auth/drive.file", "https://www.googleapis.com/auth/spreadsheets"]
+DEFAULT_SECRET_FILE = os.path.join(os.getcwd(), 'client_secret.json')
+DEFAULT_SNAPSHOT = os.environ.get("NON_INVENTORY_SNAPSHOT", os.path.join(os.getcwd(), ".non_inventory", "non_inventory.json"))
+DEFAULT_TTL = 15 * 60 # seconds before the sheet is checked for changes again
+HTTP_TIMEOUT = 10 # seconds, a slow API falls back to the snapshot
+
+
+class NonInventoryResult(NamedTuple):
+    data: pd.DataFrame      # one 'storage_unit' column, empty when nothing could be loaded
+    modified_time: str      # sheet modifiedTime the data belongs to ('' when unknown)
+    fetched_at: float       # when the values were downloaded (time.time())
+    source: str             # 'sheet', 'memory' or 'snapshot'
+    error: str = ''         # why the snapshot was served, if it was
+
+
+class GoogleSheetsClient:
+    """Sheets and Drive services built once from a service account file."""
+    def __init__(self, secret_file=DEFAULT_SECRET_FILE, timeout=HTTP_TIMEOUT):
+        self.secret_file = secret_file
+        self.timeout = timeout
+        self._sheets = None
+        self._drive = None
+
+    def _build(self):
+        # imported here so the module loads without the google client libraries
+        import google_auth_httplib2
+        import httplib2
+        from google.oauth2 import service_account
+        from googleapiclient import discovery
+        credentials = service_account.Credentials.from_service_account_file(self.secret_file, scopes=SCOPES)
+
+        def http():
+            return google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http(timeout=self.timeout))
+        self._sheets = discovery.build('sheets', 'v4', http=http(), cache_discovery=False)
+        self._drive = discovery.build('drive', 'v3', http=http(), cache_discovery=False)
+
+    def modified_time(self, spreadsheet_id):
+        if self._drive is None:
+            self._build()
+        return self._drive.files().get(fileId=spreadsheet_id, fields='modifiedTime').execute()['modifiedTime']
+
+    def values(self, spreadsheet_id, range_name):
+        if self._sheets is None:
+            self._build()
+        return self._sheets.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=range_name).execute().get('values', [])
+
+
+class StaticSheetsClient:
+    """Client serving fixed rows, for running without network."""
+    def __init__(self, rows, modified_time='static'):
+        self.rows = rows
+        self._modified_time = modified_time
+        self.downloads = 0
+
+    def modified_time(self, spreadsheet_id):
+        return self._modified_time
+
+    def values(self, spreadsheet_id, range_name):
+        self.downloads += 1
+        return self.rows
+
+
+def to_frame(rows):
+    """'storage_unit' frame from the value rows of a single column range (empty rows are omitted by the API)."""
+    return pd.DataFrame({'storage_unit': [row[0] for row in rows if row and str(row[0]).strip()]}, dtype=object)
+
+
+class NonInventoryList:
+    def __init__(self, client=None, snapshot_path=DEFAULT_SNAPSHOT, ttl=DEFAULT_TTL,
+                 spreadsheet_id=SPREADSHEET_ID, range_name=RANGE, clock=time.time):
+        self.client = client or GoogleSheetsClient()
+        self.snapshot_path = snapshot_path
+        self.ttl = ttl
+        self.spreadsheet_id = spreadsheet_id
+        self.range_name = range_name
+        self.clock = clock
+        self._result = None
+        self._checked_at = None
+        self._lock = threading.Lock() # shared by every session of the app
+
+    def _load_snapshot(self):
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            return NonInventoryResult(to_frame(snapshot['values']), snapshot['modified_time'], snapshot['fetched_at'], 'snapshot')
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save_snapshot(self, rows, modified_time, fetched_at):
+        os.makedirs(os.path.dirname(self.snapshot_path) or '.', exist_ok=True)
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'values': rows, 'modified_time': modified_time, 'fetched_at': fetched_at}, f)
+        os.replace(tmp_path, self.snapshot_path)
+
+    def get(self, force=False):
+        """The non-inventory list, downloaded only when the TTL ran out and the sheet changed."""
+        with self._lock:
+            now = self.clock()
+            if not force and self._result is not None and now - self._checked_at < self.ttl:
+                return self._result._replace(source='memory')
+            if self._result is None:
+                self._result = self._load_snapshot()
+            try:
+                modified_time = self.client.modified_time(self.spreadsheet_id)
+                if force or self._result is None or self._result.modified_time != modified_time:
+                    rows = self.client.values(self.spreadsheet_id, self.range_name)
+                    self._save_snapshot(rows, modified_time, now)
+                    self._result = NonInventoryResult(to_frame(rows), modified_time, now, 'sheet')
+                else:
+                    self._result = self._result._replace(error='')
+                self._checked_at = now
+                return self._result
+            except Exception as e: # network, auth and API errors all fall back to the last good copy
+                if self._result is None:
+                    return NonInventoryResult(to_frame([]), '', None, 'snapshot', str(e)) # nothing to serve, try again next time
+                self._result = self._result._replace(source='snapshot', error=str(e))
+                self._checked_at = now # don't wait on a failing API on every rerun
+                return self._result
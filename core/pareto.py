@@ -0,0 +1,36 @@
+"""Pareto data for the Forge failure tables.
+
+pareto_table computes the Pareto columns of every model at once: failures
+sorted by Qty within their model, each one's share of the model's total and the
+cumulative share, with a label for the chart axis. The charts only read this
+frame, they do no pandas work of their own.
+"""
+import pandas as pd
+
+PARETO_COLUMNS = ['Model', 'Rank', 'Failure Code', 'Description', 'Qty', 'Share', 'Cumulative Share', 'Label']
+
+
+def pareto_table(failures, top_n=None):
+    """Tidy Pareto frame of a failure table (<section> Failures, Model, [Convert], Qty).
+
+    Models keep the order they first appear in; Rank counts from 0 within a
+    model. Shares are of the model's total, also when only the top_n
+    failures of each model are kept.
+    """
+    df = pd.DataFrame({
+        'Model': pd.Categorical(failures['Model'].astype(str), categories=pd.unique(failures['Model'].astype(str))),
+        'Description': failures.iloc[:, 0].astype(str).to_numpy(),
+        'Qty': pd.to_numeric(failures['Qty'], errors='coerce').fillna(0).astype('int64').to_numpy(),
+    })
+    df['Failure Code'] = df['Description'].str.split(":", n=1).str[0] # extract codes
+    df = df.sort_values(['Model', 'Qty'], ascending=[True, False], kind='stable', ignore_index=True)
+
+    by_model = df.groupby('Model', observed=True, sort=False)['Qty']
+    totals = by_model.transform('sum').replace(0, 1) # a model with only zero counts gets zero shares
+    df['Share'] = df['Qty'] / totals
+    df['Cumulative Share'] = by_model.cumsum() / totals
+    df['Rank'] = df.groupby('Model', observed=True, sort=False).cumcount()
+    df['Label'] = df['Failure Code'] + ' ' + df['Qty'].astype(str) + ' ' + (df['Share'] * 100).round(1).astype(str) + '%'
+    if top_n is not None:
+        df = df[df['Rank'] < top_n]
+    return df[PARETO_COLUMNS]
@@ -0,0 +1,243 @@
+"""Persistent cache for parsed uploads.
+
+Entries are keyed by a hash of the uploaded bytes plus the parser name and
+version, so the same report uploaded from another tab or after a restart is
+read back from disk instead of being parsed again. DataFrames inside the
+result are stored as Parquet (pickle when pyarrow is missing or the frame has
+columns Parquet can't hold); the rest of the result is pickled around them.
+The directory is kept under a size limit by evicting the least recently used
+entries.
+"""
+import functools
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_CACHE_DIR = os.environ.get("PARSE_CACHE_DIR", os.path.join(os.getcwd(), ".parse_cache"))
+DEFAULT_MAX_BYTES = int(float(os.environ.get("PARSE_CACHE_MAX_MB", 512)) * 1024 * 1024)
+MEMORY_ENTRIES = 8 # parsed results also kept in process so reruns skip the disk read
+
+
+class _FrameRef:
+    """Placeholder left in the pickled result where a DataFrame was stored separately."""
+    def __init__(self, name):
+        self.name = name
+
+
+def read_bytes(source):
+    """Return the raw bytes of a path, bytes or file object (e.g. a streamlit UploadedFile)."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            return f.read()
+    if hasattr(source, 'getvalue'):
+        return source.getvalue()
+    source.seek(0)
+    data = source.read()
+    source.seek(0)
+    return data
+
+
+def content_key(data, *parts):
+    digest = hashlib.blake2b(data, digest_size=20)
+    for part in parts:
+        digest.update(b'\0' + str(part).encode())
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """On-disk, size bounded LRU cache of parsed uploads.
+
+    Usage:
+        cache = ParseCache("/tmp/parse_cache")
+        report = cache.get_or_parse(uploaded_file, "forge", 1, parse_forge_report)
+
+    Results are shared between callers, copy them before mutating.
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def get_or_parse(self, source, parser_name, version, parse, *args):
+        """Return parse(source, *args), reading it from the cache when the same bytes were parsed before."""
+        key = content_key(read_bytes(source), parser_name, version, *args)
+        result = self.get(key)
+        if result is None:
+            result = parse(source, *args)
+            self.put(key, result)
+        return result
+
+    def get(self, key):
+        """Cached result for a content_key, None (counted as a miss) when there is none."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+
+        result = self._load(key)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if result is not None:
+            self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        self._store(key, result)
+        self._remember(key, result)
+
+    def summary(self):
+        return f"Parse cache: {self.hits} hits / {self.misses} misses"
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.makedirs(self.directory, exist_ok=True)
+
+    # ----- storage -----
+    def _remember(self, key, result):
+        with self._lock:
+            self._memory[key] = result
+            self._memory.move_to_end(key)
+            while len(self._memory) > MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def _load(self, key):
+        entry = self._entry_dir(key)
+        manifest = os.path.join(entry, 'result.pkl')
+        if not os.path.exists(manifest):
+            return None
+        try:
+            with open(manifest, 'rb') as f:
+                result = pickle.load(f)
+            result = _restore_frames(result, entry)
+        except Exception: # unreadable or half evicted entry, parse again
+            shutil.rmtree(entry, ignore_errors=True)
+            return None
+        os.utime(entry) # mark as recently used
+        return result
+
+    def _store(self, key, result):
+        tmp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+        try:
+            frames = []
+            stripped = _extract_frames(result, frames)
+            for i, frame in enumerate(frames):
+                _write_frame(frame, os.path.join(tmp_dir, f'frame{i}'))
+            with open(os.path.join(tmp_dir, 'result.pkl'), 'wb') as f:
+                pickle.dump(stripped, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_dir, self._entry_dir(key))
+        except OSError: # another session stored the same entry first, or the disk is full
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if name.startswith('.tmp-') or not os.path.isdir(path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(path))
+            entries.append((os.stat(path).st_mtime, size, path))
+            total += size
+        entries.sort() # least recently used first
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def _extract_frames(value, frames):
+    """Swap every DataFrame in a nested result for a _FrameRef, collecting the frames."""
+    if isinstance(value, pd.DataFrame):
+        frames.append(value)
+        return _FrameRef(f'frame{len(frames) - 1}')
+    if isinstance(value, tuple) and hasattr(value, '_fields'): # NamedTuple
+        return type(value)(*(_extract_frames(v, frames) for v in value))
+    if isinstance(value, (list, tuple)):
+        return type(value)(_extract_frames(v, frames) for v in value)
+    if isinstance(value, dict):
+        converted = value.copy() # keeps the dict subclass (defaultdict etc.)
+        for k, v in value.items():
+            converted[k] = _extract_frames(v, frames)
+        return converted
+    return value
+
+
+def _restore_frames(value, entry):
+    if isinstance(value, _FrameRef):
+        return _read_frame(os.path.join(entry, value.name))
+    if isinstance(value, tuple) and hasattr(value, '_fields'):
+        return type(value)(*(_restore_frames(v, entry) for v in value))
+    if isinstance(value, (list, tuple)):
+        return type(value)(_restore_frames(v, entry) for v in value)
+    if isinstance(value, dict):
+        for k, v in value.items():
+            value[k] = _restore_frames(v, entry)
+        return value
+    return value
+
+
+def _write_frame(frame, path):
+    try:
+        frame.to_parquet(path + '.parquet')
+    except Exception: # no pyarrow, non string column names, mixed object columns...
+        if os.path.exists(path + '.parquet'):
+            os.remove(path + '.parquet')
+        frame.to_pickle(path + '.pkl')
+
+
+def _read_frame(path):
+    if os.path.exists(path + '.parquet'):
+        return pd.read_parquet(path + '.parquet')
+    return pd.read_pickle(path + '.pkl')
+
+
+_default_cache = None
+
+
+def get_parse_cache():
+    """Process wide cache shared by every page."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = ParseCache()
+    return _default_cache
+
+
+def cached_parse(parser_name, version):
+    """Decorator caching a parse function by the content of its first argument.
+
+    Usage:
+        @cached_parse("forge", version=1)
+        def get_data(file_name):
+            ...
+    Bump the version whenever the parse output changes so stale entries are ignored.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(source, *args):
+            return get_parse_cache().get_or_parse(source, parser_name, version, func, *args)
+        return wrapper
+    return decorator
@@ -0,0 +1,60 @@
+"""Directories of numbered Parquet part files.
+
+A PartStore appends a DataFrame as part-00000.parquet, part-00001.parquet, ...
+and reads them back as one frame. Each part is written to a hidden temporary
+file and renamed into place, so a reader never sees half a part. compact
+replaces the parts by one; the new part is written before the old ones are
+removed, so nothing is lost on a crash. Used by the bin audit snapshot and the
+SAP export store.
+"""
+import os
+
+import pandas as pd
+
+PREFIX = "part-"
+SUFFIX = ".parquet"
+
+
+class PartStore:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def parts(self):
+        """Part file names, oldest first."""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory) if name.startswith(PREFIX) and name.endswith(SUFFIX))
+
+    def load(self):
+        """All parts as one frame, None when there are none."""
+        parts = self.parts()
+        if not parts:
+            return None
+        return pd.concat([pd.read_parquet(os.path.join(self.directory, part)) for part in parts], ignore_index=True)
+
+    def append(self, df):
+        """Write df as the next part; returns its name."""
+        os.makedirs(self.directory, exist_ok=True)
+        parts = self.parts()
+        number = int(parts[-1][len(PREFIX):-len(SUFFIX)]) + 1 if parts else 0
+        name = f"{PREFIX}{number:05d}{SUFFIX}"
+        tmp_path = os.path.join(self.directory, f".{name}.tmp")
+        df.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, os.path.join(self.directory, name))
+        return name
+
+    def compact(self, df):
+        """Replace every part by one part holding df (usually load() deduplicated)."""
+        old_parts = self.parts()
+        self.append(df)
+        for part in old_parts:
+            os.remove(os.path.join(self.directory, part))
+
+    def clear(self):
+        for part in self.parts():
+            os.remove(os.path.join(self.directory, part))
+
+    def updated_at(self):
+        """Time the latest part was written, None when there are none."""
+        parts = self.parts()
+        return os.path.getmtime(os.path.join(self.directory, parts[-1])) if parts else None
@@ -0,0 +1,58 @@
+"""Table readers for uploaded exports.
+
+read_table reads an Excel workbook or a CSV export into a DataFrame, passing
+the wanted columns and dtypes to the reader up front. Workbooks are read with
+python-calamine when it is installed (much faster than openpyxl on large
+sheets) and with openpyxl otherwise. Set EXCEL_ENGINE to force an engine.
+"""
+import importlib.util
+import os
+
+import pandas as pd
+
+CSV_EXTENSIONS = ('.csv', '.txt')
+
+
+def _pandas_version():
+    return tuple(int(part) for part in pd.__version__.split('.')[:2] if part.isdigit())
+
+
+def excel_engine():
+    """Fastest Excel engine available: calamine (pandas >= 2.2 + python-calamine) or openpyxl."""
+    forced = os.environ.get("EXCEL_ENGINE")
+    if forced:
+        return forced
+    if _pandas_version() >= (2, 2) and importlib.util.find_spec("python_calamine") is not None:
+        return "calamine"
+    return "openpyxl"
+
+
+def source_name(source):
+    """File name of a path or an uploaded file, '' when unknown."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return getattr(source, 'name', '') or ''
+
+
+def is_csv(source):
+    return source_name(source).lower().endswith(CSV_EXTENSIONS)
+
+
+def read_table(source, usecols=None, dtype=None, sheet_name=0):
+    """Read a workbook or csv export.
+
+    Parameters
+    ----------
+    source:
+        path or file object (e.g. a streamlit UploadedFile); files whose name
+        ends with .csv/.txt are read as csv, everything else as Excel.
+    usecols:
+        columns to read, the others are skipped by the reader.
+    dtype:
+        dtypes passed to the reader, e.g. {'Product Tested': str}.
+    """
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    if is_csv(source):
+        return pd.read_csv(source, usecols=usecols, dtype=dtype)
+    return pd.read_excel(source, sheet_name=sheet_name, usecols=usecols, dtype=dtype, engine=excel_engine())
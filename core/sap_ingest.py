@@ -0,0 +1,290 @@
+"""Drop-folder ingestion of the SAP COOIS and ZSCM exports.
+
+    python -m core.sap_ingest DROP_DIR [--store STORE_DIR] [--interval SECONDS] [--once]
+
+The VBS scripts export SAP lists (order headers, capacities, document goods
+movements, exploded BOM). Saved as local files into DROP_DIR (unconverted or
+text with tabs, CSV or Excel), every new or changed export is parsed once and
+appended to a Parquet store with one directory per export kind. SapStore.load
+returns a kind's rows deduplicated on its key (order, material document,
+BOM item), later exports winning, so the dashboards read the store instead of
+waiting for a manual upload.
+
+The folder is polled; when the optional watchdog package is installed, file
+events (inotify on Linux) wake the loop up right away.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import NamedTuple
+
+import pandas as pd
+
+from core.part_store import PartStore
+from core.readers import read_table, source_name
+
+DEFAULT_STORE_DIR = os.environ.get("SAP_STORE_DIR", os.path.join(os.getcwd(), ".sap_store"))
+POLL_INTERVAL = 30 # seconds between folder scans
+SETTLE_SECONDS = 5 # files modified more recently than this may still be written by SAP
+MAX_PARTS = 50 # compact a kind into one file past this many parts
+EXPORT_EXTENSIONS = ('.txt', '.csv', '.xlsx', '.xls', '.xlsm')
+PARSER_VERSION = 1 # bump when the output of parse_sap_export changes, invalidates the parse cache
+
+
+class SapExport(NamedTuple):
+    prefix: str             # file name prefix, the VBS script that produces it
+    signature: tuple        # header columns that identify the list
+    key: tuple              # columns a row is deduplicated on
+
+
+EXPORTS = {
+    'order_headers': SapExport('COOIS_Order_Headers', ('Order', 'Delivered quantity (GMEIN)'), ('Order',)),
+    'capacities': SapExport('COOIS_CAPACITIES', ('Order', 'Operation/Activity'), ('Order', 'Operation/Activity')),
+    'goods_movements': SapExport('COOIS_WO_Doc_Goods_Mvt', ('Qty in UoE + sign (ERFME)',), ('Material Document', 'Material Doc.Item')),
+    'exploded_bom': SapExport('ZSCM_BOM', ('Material', 'Component'), ('Material', 'Stack operation', 'Item', 'Component')),
+}
+
+
+def detect_kind(name, columns=()):
+    """Export kind from the file name prefix, else from the header columns; None when unknown."""
+    base = os.path.basename(name).lower()
+    for kind, export in EXPORTS.items():
+        if base.startswith(export.prefix.lower()):
+            return kind
+    for kind, export in EXPORTS.items():
+        if all(column in columns for column in export.signature):
+            return kind
+    return None
+
+
+# ----- parsing -----
+def _decode(raw):
+    """Text of a list export; SAP writes UTF-16 (with BOM) for unicode exports, cp1252 or UTF-8 otherwise."""
+    if raw.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return raw.decode('utf-16')
+    try:
+        return raw.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        return raw.decode('cp1252')
+
+
+def parse_sap_list(text):
+    """DataFrame of an SAP list saved as text, '|' framed (unconverted) or tab separated.
+
+    Title lines before the table, dashed ruler lines and the header repeated
+    on every page are dropped. All values are kept as stripped strings.
+    """
+    lines = [line for line in text.splitlines() if line.strip() and line.strip(' -|\t')]
+    header_index = next((i for i, line in enumerate(lines) if '|' in line or '\t' in line), None)
+    if header_index is None:
+        return pd.DataFrame()
+    separator = '|' if '|' in lines[header_index] else '\t'
+
+    def cells(line):
+        values = [value.strip() for value in line.split(separator)]
+        if separator == '|':
+            values = values[1:-1] if line.strip().startswith('|') else values # the frame adds empty cells at both ends
+        return values
+
+    header = cells(lines[header_index])
+    rows = []
+    for line in lines[header_index + 1:]:
+        values = cells(line)
+        if values == header:
+            continue
+        rows.append((values + [''] * len(header))[:len(header)])
+    return pd.DataFrame(rows, columns=_unique(header))
+
+
+def _unique(columns):
+    """SAP lists can repeat a heading (e.g. two 'Object description' columns), pandas-style .1 suffixes make them unique."""
+    seen, result = {}, []
+    for column in columns:
+        count = seen.get(column, 0)
+        result.append(f"{column}.{count}" if count else column)
+        seen[column] = count + 1
+    return result
+
+
+def parse_sap_export(source):
+    """Rows of one export (path or file object) as strings: SAP list text (.txt), CSV or Excel."""
+    if source_name(source).lower().endswith('.txt'):
+        if hasattr(source, 'read'):
+            source.seek(0)
+            df = parse_sap_list(_decode(source.read()))
+        else:
+            with open(source, 'rb') as f:
+                df = parse_sap_list(_decode(f.read()))
+    else:
+        df = read_table(source, dtype=str)
+    df.columns = [str(column).strip() for column in df.columns]
+    return df.apply(lambda column: column.str.strip()).fillna('')
+
+
+# ----- store -----
+class IngestedFile(NamedTuple):
+    name: str
+    kind: str
+    rows: int
+    seconds: float
+    error: str = ''
+
+
+class SapStore:
+    """Parquet store of ingested exports, one directory of part files per kind.
+
+    Every ingested file becomes a new part; nothing already stored is
+    rewritten. load deduplicates on the kind's key, rows from later parts
+    win. manifest.json records the size and mtime of every file seen, so a
+    file is only parsed again when it changes.
+    """
+    def __init__(self, directory=DEFAULT_STORE_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _parts(self, kind):
+        return PartStore(os.path.join(self.directory, kind))
+
+    def _manifest_path(self):
+        return os.path.join(self.directory, 'manifest.json')
+
+    def manifest(self):
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_manifest(self, manifest):
+        tmp_path = self._manifest_path() + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=1)
+        os.replace(tmp_path, self._manifest_path())
+
+    def load(self, kind):
+        """All stored rows of a kind, deduplicated on its key (every column when the key columns are missing)."""
+        df = self._parts(kind).load()
+        if df is None:
+            return pd.DataFrame()
+        df = df.fillna('') # parts exported with another layout lack some columns
+        key = [column for column in EXPORTS[kind].key if column in df.columns]
+        subset = key if len(key) == len(EXPORTS[kind].key) else None
+        return df.drop_duplicates(subset=subset, keep='last', ignore_index=True)
+
+    def updated_at(self, kind):
+        """Time of the latest part of a kind, None when nothing is stored."""
+        return self._parts(kind).updated_at()
+
+    def ingest_file(self, path, kind=None):
+        """Parse one export and store it as a new part of its kind."""
+        start = time.perf_counter()
+        name = os.path.basename(path)
+        try:
+            df = parse_sap_export(path)
+            kind = kind or detect_kind(name, df.columns)
+            if kind is None:
+                raise ValueError("not a known SAP export (file name or columns)")
+            if len(df):
+                with self._lock:
+                    parts = self._parts(kind)
+                    parts.append(df)
+                    if len(parts.parts()) > MAX_PARTS:
+                        parts.compact(self.load(kind))
+            return IngestedFile(name, kind, len(df), time.perf_counter() - start)
+        except Exception as e:
+            return IngestedFile(name, kind or '', 0, time.perf_counter() - start, traceback.format_exception_only(type(e), e)[-1].strip())
+
+    def ingest_folder(self, folder, settle=SETTLE_SECONDS):
+        """Ingest the exports in folder that are new or changed since they were last seen."""
+        manifest = self.manifest()
+        results = []
+        now = time.time()
+        for entry in sorted(os.scandir(folder), key=lambda entry: entry.name):
+            if not entry.is_file() or not entry.name.lower().endswith(EXPORT_EXTENSIONS):
+                continue
+            stat = entry.stat()
+            if now - stat.st_mtime < settle:
+                continue # SAP may still be writing it, picked up on the next scan
+            seen = manifest.get(entry.name)
+            if seen and seen['size'] == stat.st_size and seen['mtime'] == stat.st_mtime:
+                continue
+            result = self.ingest_file(entry.path)
+            manifest[entry.name] = {'size': stat.st_size, 'mtime': stat.st_mtime, 'kind': result.kind,
+                                    'rows': result.rows, 'error': result.error}
+            results.append(result)
+        if results:
+            self._save_manifest(manifest)
+        return results
+
+
+# ----- watching -----
+def _start_observer(folder, wake):
+    """Set `wake` on file events in folder when watchdog is installed; returns the observer or None."""
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            wake.set()
+
+    observer = Observer()
+    observer.schedule(Handler(), folder, recursive=False)
+    observer.start()
+    return observer
+
+
+def watch(folder, store, interval=POLL_INTERVAL, settle=SETTLE_SECONDS, on_ingest=None, stop=None):
+    """Ingest new exports from folder until `stop` (a threading.Event) is set."""
+    stop = stop or threading.Event()
+    wake = threading.Event()
+    observer = _start_observer(folder, wake)
+    try:
+        while not stop.is_set():
+            wake.clear()
+            results = store.ingest_folder(folder, settle)
+            if results and on_ingest:
+                on_ingest(results)
+            if wake.wait(interval) and settle:
+                wake.clear()
+                time.sleep(settle) # let the writer finish before the next scan
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+def _print_results(results):
+    for result in results:
+        print(f"{result.name:<50} {result.kind:<16} {result.rows:>8} rows {result.seconds:>6.2f}s {result.error}", flush=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest SAP COOIS/ZSCM exports dropped in a folder into a Parquet store.")
+    parser.add_argument('drop_dir')
+    parser.add_argument('--store', default=DEFAULT_STORE_DIR)
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="seconds between scans")
+    parser.add_argument('--once', action='store_true', help="ingest what is there and exit")
+    args = parser.parse_args(argv)
+
+    store = SapStore(args.store)
+    if args.once:
+        results = store.ingest_folder(args.drop_dir, settle=0)
+        _print_results(results)
+        return 1 if any(result.error for result in results) else 0
+    try:
+        watch(args.drop_dir, store, args.interval, on_ingest=_print_results)
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
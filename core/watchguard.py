@@ -0,0 +1,163 @@
+"""WatchGuard product families and yield calculations.
+
+Each Product Tested Description starts with a WGA part prefix (the text before
+the first "-"); the prefix decides the product family. Adding a product line
+is a one line change to FAMILY_PREFIXES. All family yields are computed from
+a single groupby so switching families on the page is a dictionary lookup.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from core.readers import read_table
+
+# prefix -> family
+FAMILY_PREFIXES = {
+    "WGA00356": "HiFi Mic", "WGA00508": "HiFi Mic",
+    "WGA00751": "HiFi Mic 2", "WGA00750": "HiFi Mic 2",
+    "WGA00359": "HiFi Base",
+    "WGA00370": "4RE Display", "WGA00526": "4RE Display",
+    "WGA00383": "4RE POE", "WGA00391": "4RE POE", "WGA00607": "4RE POE",
+    "WGA00480": "4RE DVRS", "WGA00615": "4RE DVRS",
+    "WGA00437": "4RE Camera", "WGA00496": "4RE Camera", "WGA00498": "4RE Camera", "WGA00500": "4RE Camera",
+    "WGA00543": "4RE Camera", "WGA00485": "4RE Camera", "WGA00522": "4RE Camera",
+    "WGA00450": "DV1",
+    "WGA00451": "DV1 MOD",
+    "WGA00461": "DV1 CAM", "WGA00468": "DV1 CAM",
+    "WGA00675": "M500", "WGA00682": "M500", "WGA00684": "M500", "WGA00690": "M500", "WGA00691": "M500", "WGA00700": "M500",
+    "WGA00548": "VISTA",
+    "WGA00520": "VISTA HD", "WGA00552": "VISTA HD", "WGA00600": "VISTA HD",
+    "WGA00555": "VISTA TS",
+    "WGA00574": "VISTA POE",
+    "WGA00576": "VISTA XLT", "WGA00583": "VISTA XLT", "WGA00584": "VISTA XLT",
+    "WGA00578": "VISTA XLT Head Cam", "WGA00582": "VISTA XLT Head Cam", "WGA00XXX": "VISTA XLT Head Cam", # ask if this is always the case
+    "WGA00586": "VISTA WiFi Charge Base", "WGA00537": "VISTA WiFi Charge Base",
+    "WGA00608": "VISTA USB Charge Base",
+    "WGA00625": "V300", "WGA00627": "V300",
+    "WGA00635": "V300 Docks", "WGA00640": "V300 Docks",
+    "WGA00650": "V300 TS2",
+}
+
+FAMILIES = list(dict.fromkeys(FAMILY_PREFIXES.values())) # unique families, in table order
+
+
+def classify_families(descriptions):
+    """Map Product Tested Description values to a categorical family, NaN for unknown prefixes."""
+    prefixes = descriptions.str.split("-").str[0]
+    return prefixes.map(FAMILY_PREFIXES).astype(pd.CategoricalDtype(FAMILIES))
+
+
+# the only columns of the test export that are used, read with these dtypes
+COLUMNS = ['Test Name', 'Product Category', 'Product Test Type', 'Product Tested', 'Product Tested Description', 'Qty Failed', 'Qty Passed', 'Test Category']
+DTYPES = {'Product Tested': str, 'Product Tested Description': str}
+
+# rows dropped when loading the test export: (rule name, column, regex)
+EXCLUSION_RULES = [
+    ("PCBA", "Product Tested", "PCBA"),
+    ("Drawings (DWG)", "Product Tested Description", "DWG"),
+    ("WGA00300 (discontinued)", "Product Tested Description", "WGA00300"),
+    ("WGP", "Product Tested Description", "WGP"),
+    ("-CS codes", "Product Tested Description", "-CS"),
+]
+
+
+def apply_exclusion_rules(df, rules=EXCLUSION_RULES):
+    """Drop the rows matched by any rule, scanning each column once with one combined regex.
+
+    Returns the kept rows and a Series with the number of rows dropped per rule.
+    A row matched by several rules is counted under the first match in its text;
+    rows with a blank value in a rule column are dropped too ("Missing <column>").
+    """
+    drop = pd.Series(False, index=df.index)
+    dropped_by = []
+    for column in dict.fromkeys(column for _, column, _ in rules):
+        column_rules = [(name, pattern) for name, rule_column, pattern in rules if rule_column == column]
+        names = np.array([name for name, _ in column_rules], dtype=object)
+        missing = df[column].isna()
+        hit = df[column].str.contains("|".join(f"(?:{pattern})" for _, pattern in column_rules), na=False)
+
+        # only the newly dropped rows are matched again to find the rule that dropped them
+        new_hit = hit & ~drop
+        matches = df.loc[new_hit, column].str.extract("|".join(f"({pattern})" for _, pattern in column_rules))
+        dropped_by.append(pd.Series(names[matches.notna().to_numpy().argmax(axis=1)], dtype=object))
+        dropped_by.append(pd.Series(f"Missing {column}", index=range(int((missing & ~drop).sum())), dtype=object))
+        drop |= hit | missing
+
+    dropped_by = pd.concat(dropped_by, ignore_index=True)
+    counts = dropped_by.value_counts().reindex([name for name, _, _ in rules], fill_value=0)
+    counts = pd.concat([counts, dropped_by.value_counts().drop(counts.index, errors='ignore')])
+    return df[~drop].copy(), counts.rename("Rows dropped")
+
+
+TEST_DATE_FORMAT = '%m/%d/%Y' # Test Name starts with the test date, e.g. "03/14/2022 08:15:02 ..."
+
+
+def parse_test_dates(test_names):
+    """Parse the date prefix of the Test Name column into datetime64, NaT when it can't be read."""
+    return pd.to_datetime(test_names.astype(str).str.split(" ", n=1).str[0], format=TEST_DATE_FORMAT, errors='coerce')
+
+
+class FamilyYields(NamedTuple):
+    by_product: dict    # family -> yield by Product Test Type, Product Tested and Product Tested Description
+    by_test_type: dict  # family -> yield by Product Test Type
+    rty: dict           # family -> Rolled Throughput Yield
+    overall_rty: float  # average Final yield * average Run-In yield over the families
+
+
+def _add_yield(df):
+    df['Yield'] = df["Qty Passed"] / (df["Qty Passed"] + df["Qty Failed"])
+    return df
+
+
+def compute_family_yields(df):
+    """Compute every family's yield tables and RTY from one groupby over the classified test rows."""
+    keys = ['Family', 'Product Test Type', 'Product Tested', 'Product Tested Description']
+    qty = ['Qty Failed', 'Qty Passed']
+    by_product = df.groupby(keys, observed=True, dropna=False)[qty].sum().reset_index()
+    by_product = by_product[by_product['Family'].notna()]
+
+    # yield by product test type is the sum of the product rows, no need to go back to the test rows
+    by_test_type = _add_yield(by_product.groupby(['Family', 'Product Test Type'], observed=True)[qty].sum().reset_index())
+    by_product = _add_yield(by_product.dropna(subset=keys[1:]).reset_index(drop=True))
+
+    # RTY is the product of the yields, ignoring rows with a 0 yield
+    rty = by_product['Yield'].where(by_product['Yield'] != 0).groupby(by_product['Family'], observed=True).prod()
+
+    # OVERALL RTY = average Final yield * average Run-In yield (from the yield by product test type tables)
+    final_average = by_test_type.loc[by_test_type['Product Test Type'] == "Final", 'Yield'].mean()
+    run_in_average = by_test_type.loc[by_test_type['Product Test Type'] == "Run-In", 'Yield'].mean()
+    overall_rty = final_average * run_in_average
+
+    return FamilyYields(
+        by_product={family: frame.drop(columns='Family').reset_index(drop=True) for family, frame in by_product.groupby('Family', observed=True)},
+        by_test_type={family: frame.drop(columns='Family').reset_index(drop=True) for family, frame in by_test_type.groupby('Family', observed=True)},
+        rty=rty.to_dict(),
+        overall_rty=overall_rty,
+    )
+
+
+def load_watchguard(source):
+    """Read a WatchGuard test export (xlsx or csv) and prepare it for the yield tables.
+
+    Returns (df, family_desc_sheet, dropped_rows): the test rows with Test Date
+    and Family columns, {family: product descriptions in it} and the number
+    of rows each exclusion rule dropped.
+    """
+    df = read_table(source, usecols=COLUMNS, dtype=DTYPES) # read only the relevant columns (xlsx or csv)
+    df = df[COLUMNS]
+
+    # convert all codes to upper case, drop the excluded rows (PCBA, DWG, WGA00300, WGP, -CS) in one pass,
+    # then replace _ with - on the kept rows (after the rules, so *_CS codes are kept as -CS)
+    df["Product Tested Description"] = df["Product Tested Description"].str.upper()
+    df, dropped_rows = apply_exclusion_rules(df)
+    df["Product Tested Description"] = df["Product Tested Description"].str.replace('_', '-', regex=False)
+
+    # parse the test date once here instead of on every rerun
+    df["Test Date"] = parse_test_dates(df["Test Name"])
+
+    # classify every row by its code prefix in one vectorized lookup
+    df["Family"] = classify_families(df["Product Tested Description"])
+    family_desc_sheet = {family: list(codes) for family, codes in df.groupby("Family", observed=True)["Product Tested Description"].unique().items()}
+
+    return df, family_desc_sheet, dropped_rows
@@ -0,0 +1,124 @@
+"""Work order BOM consumption variance.
+
+For every work order, each component of its material's exploded BOM is
+compared with the goods movements booked for it: Consumption is the component
+quantity moved divided by the BOM quantity per unit, Output the order's
+delivered quantity, and an order has a discrepancy when any component's
+Consumption differs from Output.
+
+consumption_variance does this for all orders at once with one merge of the
+order headers, the exploded BOM and the goods movements aggregated per
+component (per order and component when the movements have an Order column).
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from core.inventory import canonical_keys
+
+ORDER_QUANTITY = 'Delivered quantity (GMEIN)'
+MOVEMENT_QUANTITY = 'Qty in UoE + sign (ERFME)'
+BOM_COLUMNS = ['Material', 'Stack operation', 'Item', 'Component', 'Object description', 'Object description.1', 'Unit', 'Quantity']
+LINE_COLUMNS = ['Order', 'Material', 'Output'] + BOM_COLUMNS[1:] + ['Input', 'Consumption', 'Difference']
+TOLERANCE = 1e-6 # Consumption is a float division, equal within this counts as equal
+
+
+class VarianceResult(NamedTuple):
+    lines: pd.DataFrame             # one row per order and BOM component
+    orders: pd.DataFrame            # one row per order with a BOM, Discrepancy flags the ones to look at
+    missing_bom: pd.DataFrame       # orders whose material has no exploded BOM
+
+
+def _by_unique(values, convert):
+    """convert applied to the distinct values only, exports repeat the same orders, materials and quantities many times."""
+    codes, uniques = pd.factorize(values)
+    converted = convert(pd.Series(list(uniques) + [None], dtype=object)) # missing values have code -1, the trailing None
+    return pd.Series(converted.to_numpy()[codes], index=values.index, dtype=converted.dtype)
+
+
+def _quantities(values):
+    text = values.astype('string').str.strip().str.replace(',', '', regex=False)
+    negative = text.str.endswith('-').fillna(False)
+    text = text.str.rstrip('-')
+    numbers = pd.to_numeric(text, errors='coerce').astype('float64')
+    return numbers.where(~negative, -numbers)
+
+
+def parse_sap_quantity(values):
+    """Numbers of SAP quantity strings such as '1,234-' (trailing minus, thousands commas) as floats, NaN when unreadable."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype('float64')
+    return _by_unique(values, _quantities)
+
+
+def material_keys(values):
+    """Trimmed upper case material numbers, see core.inventory.canonical_keys."""
+    return _by_unique(values, canonical_keys)
+
+
+def _order_keys(values):
+    keys = canonical_keys(values).str.lstrip('0')
+    return keys.mask(keys == '')
+
+
+def order_keys(values):
+    """Order numbers as keys: '1222522', 1222522 and '000001222522' are the same order."""
+    return _by_unique(values, _order_keys)
+
+
+def consumption_variance(work_orders, exploded_bom, goods_movements):
+    """Output vs Consumption of every BOM component of every work order.
+
+    Parameters
+    ----------
+    work_orders:
+        COOIS order headers: Order, Material, Delivered quantity (GMEIN).
+        An order listed more than once keeps its last row.
+    exploded_bom:
+        ZSCM exploded BOM: Material, Component, Quantity (per unit of Material)
+        and the descriptive columns of BOM_COLUMNS when present.
+    goods_movements:
+        COOIS document goods movements: Material, Qty in UoE + sign (ERFME)
+        and optionally Order. Issues and their reversals net out; Input is
+        the size of the net quantity, whichever sign the export uses.
+    """
+    orders = pd.DataFrame({
+        'Order': order_keys(work_orders['Order']),
+        'Material': material_keys(work_orders['Material']),
+        'Output': parse_sap_quantity(work_orders[ORDER_QUANTITY]),
+    }).dropna(subset=['Order']).drop_duplicates('Order', keep='last')
+
+    bom = exploded_bom[[column for column in BOM_COLUMNS if column in exploded_bom.columns]].copy()
+    bom['Material'] = material_keys(bom['Material'])
+    bom['Component'] = material_keys(bom['Component'])
+    bom['Quantity'] = parse_sap_quantity(bom['Quantity'])
+
+    movements = pd.DataFrame({
+        'Component': material_keys(goods_movements['Material']),
+        'Input': parse_sap_quantity(goods_movements[MOVEMENT_QUANTITY]).fillna(0),
+    })
+    by = ['Component']
+    if 'Order' in goods_movements.columns:
+        movements['Order'] = order_keys(goods_movements['Order'])
+        by = ['Order', 'Component']
+    inputs = movements.groupby(by, sort=False)['Input'].sum().abs().reset_index()
+
+    lines = orders.merge(bom, on='Material', how='inner').merge(inputs, on=by, how='left')
+    lines['Input'] = lines['Input'].fillna(0)
+    lines['Consumption'] = lines['Input'] / lines['Quantity'].replace(0, np.nan)
+    lines['Difference'] = lines['Consumption'] - lines['Output']
+    lines = lines[[column for column in LINE_COLUMNS if column in lines.columns]]
+
+    # a component that can't be computed (no BOM quantity or output) counts as a discrepancy
+    discrepant = ~(lines['Difference'].abs() <= TOLERANCE)
+    summary = lines.assign(Discrepant=discrepant, **{'Abs Difference': lines['Difference'].abs()}).groupby('Order', sort=False).agg(
+        Material=('Material', 'first'),
+        Output=('Output', 'first'),
+        Components=('Component', 'size'),
+        **{'Discrepant Components': ('Discrepant', 'sum'), 'Max Abs Difference': ('Abs Difference', 'max')},
+    ).reset_index()
+    summary['Discrepancy'] = summary['Discrepant Components'] > 0
+
+    missing_bom = orders[~orders['Material'].isin(bom['Material'])].reset_index(drop=True)
+    return VarianceResult(lines.reset_index(drop=True), summary, missing_bom)
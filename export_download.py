@@ -0,0 +1,28 @@
+"""Export download block shared by the dashboard pages.
+
+The format is picked in the sidebar; the export file is only written when the
+"Prepare" button is clicked and is found again for the same data and format,
+see core.export.keyed_export.
+"""
+import streamlit as st
+
+from core.export import EXPORT_FORMATS, find_export, keyed_export
+from core.parse_cache import content_key
+
+
+def render_export(data_key, build_sheets, file_name, button_area=st):
+    """Format picker, prepare button and download button for the tables of build_sheets().
+
+    data_key identifies the exported data (e.g. the upload hashes and the page);
+    build_sheets returns {sheet name: DataFrame} and is only called when the
+    export for data_key and the format isn't written yet.
+    """
+    export_format = st.sidebar.selectbox("Export format", EXPORT_FORMATS)
+    export_key = content_key(data_key.encode(), export_format)
+    export = find_export(export_key)
+    if export is None and button_area.button(f"Prepare {export_format} export"):
+        export = keyed_export(export_key, build_sheets, export_format)
+    if export:
+        export_path, extension, mime = export
+        with open(export_path, 'rb') as export_data:
+            st.download_button(label=f"Export data to {export_format}", file_name=file_name + extension, data=export_data, mime=mime)
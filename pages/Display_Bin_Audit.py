@@ -1,7 +1,11 @@
-import cx_Oracle
+import math
+import time
 import pandas as pd
 import streamlit as st
-from io import BytesIO
+from datetime import datetime
+from core.parse_cache import content_key
+from core.bin_audit import COLUMNS, BinAuditFilters, BinAuditSnapshot, InMemoryBinAuditBackend, SQLBinAuditBackend, open_pool, pooled_connection
+from export_download import render_export
 
 
 st.set_page_config(
@@ -9,21 +13,65 @@ st.set_page_config(
     layout="wide"
 )
 
-# cache the dataframe to memory so we don't have to read it over and over again
-# Create a dictionary whose key is the sheet name and values are the codes in that sheet name
-# @st.cache()
-# def get_data_from_excel(file_name):
-def to_excel(df):
-    output = BytesIO()
-    writer = pd.ExcelWriter(output, engine='xlsxwriter')
-    df.to_excel(writer, index=False, sheet_name='Sheet1')
-    workbook = writer.book
-    worksheet = writer.sheets['Sheet1']
-    format1 = workbook.add_format({'num_format': '0.00'}) 
-    worksheet.set_column('A:A', None, format1)  
-    writer.save()
-    processed_data = output.getvalue()
-    return processed_data
+CACHE_TTL = 10 * 60 # seconds before the bin audit data is fetched again
+SNAPSHOT_SOURCE = "Local snapshot"
+DATABASE_SOURCE = "Database"
+PAGE_SIZES = [50, 100, 500, 1000]
+
+# one connection pool per server process, shared by every session and rerun
+@st.cache_resource
+def get_pool():
+    return open_pool()
+
+# local parquet copy of the audit table, only rows newer than its latest Date are pulled from the database
+@st.cache_resource
+def get_snapshot():
+    return BinAuditSnapshot()
+
+# sync at most once per CACHE_TTL; cache_resource hands out the snapshot itself instead of
+# a copy on every call, it is only read (filtered, sorted, sliced) by the in-memory backend
+@st.cache_resource(ttl=CACHE_TTL)
+def load_bin_audit():
+    with pooled_connection(get_pool()) as conn:
+        return get_snapshot().sync(conn)
+
+# the metrics only need the small sync metadata, not the table
+@st.cache_data(ttl=CACHE_TTL)
+def load_sync_status():
+    sync = load_bin_audit()
+    return len(sync.data), sync.new_rows, sync.high_water, sync.synced_at
+
+def full_reload():
+    with pooled_connection(get_pool()) as conn:
+        get_snapshot().full_refresh(conn)
+    clear_page_cache()
+
+# the database backend filters, sorts and pages in SQL; the snapshot backend does the same in pandas
+def get_backend(source):
+    if source == DATABASE_SOURCE:
+        return SQLBinAuditBackend(get_pool())
+    return InMemoryBinAuditBackend(load_bin_audit().data)
+
+@st.cache_data(ttl=CACHE_TTL)
+def query_statuses(source):
+    return get_backend(source).statuses()
+
+@st.cache_data(ttl=CACHE_TTL)
+def query_count(source, filters):
+    return get_backend(source).count(filters)
+
+@st.cache_data(ttl=CACHE_TTL)
+def query_page(source, filters, sort_by, descending, page, page_size):
+    return get_backend(source).page(filters, sort_by, descending, page, page_size)
+
+# only this page's cached queries, the other pages keep theirs
+def clear_page_cache():
+    for cached in (load_bin_audit, load_sync_status, query_statuses, query_count, query_page):
+        cached.clear()
+
+# the full filtered table is only read and written when an export is asked for, reused for CACHE_TTL
+def export_key(source, filters, sort_by, descending):
+    return content_key(repr((source, filters, sort_by, descending)).encode(), "bin-audit-export", int(time.time() // CACHE_TTL))
 
 if __name__ == '__main__':
     st.title(":bar_chart: Display Bin Audit")
@@ -31,25 +79,46 @@ if __name__ == '__main__':
 
 
     # ------ USER INTERFACE ------
-    # ------ Home page ------
-    conStr = 'valordfmprd/oracl3@il01dbpn3:1521/VALORORA'
-    conn = cx_Oracle.connect(conStr)
-    cur = conn.cursor()
-
-    query = """SELECT WHEN, PERSON, PART, QTY, BIN, STATUS FROM INVENTORY_BIN_DATA"""
-
-    cur.execute(query)
-    bin_audit_list = cur.fetchall()
-    bin_audit_df = pd.DataFrame(bin_audit_list)
-    bin_audit_df.columns = ['Date', 'Person', 'Part', 'QTY', 'Bin', 'Status']    
-    st.dataframe(bin_audit_df)
-    # do something like fetch, insert etc.
-    cur.close()
-    conn.close()
-
-    df_xlsx = to_excel(bin_audit_df)
-    st.download_button(label='📥 Export to Excel',
-                                    data=df_xlsx ,
-                                    file_name= 'Bin_Audit_Data.xlsx')
-
- 
\ No newline at end of file
+    # --- Sidebar ---
+    source = st.sidebar.radio("Data source", [SNAPSHOT_SOURCE, DATABASE_SOURCE])
+    if st.sidebar.button("🔄 Refresh data"): # bypass the cache, pull the new rows and query again
+        clear_page_cache()
+    if st.sidebar.button("Reload full table"): # rebuild the local snapshot from scratch
+        full_reload()
+
+    if source == SNAPSHOT_SOURCE:
+        rows, new_rows, high_water, synced_at = load_sync_status()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Rows", f"{rows:,}", f"{new_rows:,} new" if new_rows else None)
+        col2.metric("Latest audit", high_water.strftime('%m/%d/%Y %H:%M') if pd.notna(high_water) else "-")
+        col3.metric("Last sync", f"{int((datetime.now() - synced_at).total_seconds() // 60)} min ago")
+
+    # --- Query panel ---
+    with st.expander("Query", expanded=True):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            dates = st.date_input("Date range", value=())
+            status = st.multiselect("Status", query_statuses(source))
+        with col2:
+            person = st.text_input("Person")
+            part = st.text_input("Part")
+        with col3:
+            bin_code = st.text_input("Bin")
+            sort_by = st.selectbox("Sort by", COLUMNS)
+            descending = st.checkbox("Descending", value=True)
+    start = dates[0] if len(dates) > 0 else None
+    end = dates[1] if len(dates) > 1 else start
+    filters = BinAuditFilters(start, end, person, part, bin_code, tuple(status))
+
+    # --- Grid, one page at a time ---
+    total_rows = query_count(source, filters)
+    col1, col2 = st.columns([1, 4])
+    page_size = col1.selectbox("Rows per page", PAGE_SIZES, index=1)
+    page_count = max(1, math.ceil(total_rows / page_size))
+    page = col1.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+    col2.caption(f"{total_rows:,} matching rows")
+    col2.dataframe(query_page(source, filters, sort_by, descending, page - 1, page_size))
+
+    # export the full filtered result, not just the visible page
+    render_export(export_key(source, filters, sort_by, descending), lambda: {'Sheet1': get_backend(source).export(filters, sort_by, descending)},
+                  'Bin_Audit_Data', button_area=st.sidebar)
@@ -0,0 +1,99 @@
+import streamlit as st
+from datetime import datetime
+from core.ingest import parse_files, timing_table
+from core.parse_cache import content_key, get_parse_cache
+from core.sap_ingest import PARSER_VERSION, SapStore, detect_kind, parse_sap_export
+from core.work_orders import consumption_variance
+from export_download import render_export
+
+st.set_page_config(
+    page_title="Work Order Variance",
+    layout="wide"
+)
+
+STORE_SOURCE = "SAP store"
+UPLOAD_SOURCE = "Upload"
+KINDS = {'order_headers': "COOIS order headers", 'exploded_bom': "ZSCM exploded BOM", 'goods_movements': "COOIS document goods movements"}
+
+# exports dropped in the SAP folder are ingested by `python -m core.sap_ingest`, see core.sap_ingest
+@st.cache_resource
+def get_store():
+    return SapStore()
+
+# the store is read again whenever a kind gets a new part
+@st.cache_data
+def load_store(updated_at):
+    store = get_store()
+    return {kind: store.load(kind) for kind in KINDS}
+
+# parse the uploads in parallel, cached on disk by file content
+def get_data(files):
+    return parse_files(files, "sap-export", PARSER_VERSION, parse_sap_export)
+
+# the frames aren't hashed, the data key identifies them
+@st.cache_data(max_entries=8)
+def get_variance(data_key, _tables):
+    return consumption_variance(_tables['order_headers'], _tables['exploded_bom'], _tables['goods_movements'])
+
+# ------ Main page ------
+st.title("🧾 Work Order BOM Consumption Variance")
+st.markdown("##")
+
+source = st.sidebar.radio("Data source", [STORE_SOURCE, UPLOAD_SOURCE])
+tables = {}
+if source == STORE_SOURCE:
+    updated_at = tuple(get_store().updated_at(kind) for kind in KINDS)
+    tables = {kind: df for kind, df in load_store(updated_at).items() if len(df)}
+    data_key = content_key(repr(updated_at).encode(), "work-order-store")
+    for kind, name in KINDS.items():
+        if kind in tables:
+            st.sidebar.caption(f"{name}: {len(tables[kind]):,} rows, updated {datetime.fromtimestamp(get_store().updated_at(kind)):%m/%d/%Y %H:%M}")
+else:
+    st.sidebar.header('Drag and drop the order headers, exploded BOM and goods movements exports here')
+    uploaded_files = st.sidebar.file_uploader('', type=['xlsx', 'csv', 'txt'], accept_multiple_files=True)
+    if uploaded_files:
+        ingested = get_data(uploaded_files)
+        for file in ingested:
+            kind = detect_kind(file.name, file.result.columns) if file.result is not None else None
+            if file.error:
+                st.sidebar.error(f"{file.name}: {file.error}")
+            elif kind in KINDS:
+                tables[kind] = file.result
+            else:
+                st.sidebar.warning(f"{file.name}: not an order headers, exploded BOM or goods movements export")
+        st.sidebar.caption(get_parse_cache().summary())
+        with st.sidebar.expander("Load times"):
+            st.table(timing_table(ingested))
+        data_key = content_key("|".join(file.key for file in ingested).encode(), "work-order-upload")
+
+missing = [name for kind, name in KINDS.items() if kind not in tables]
+if missing:
+    st.info("Missing data: " + ", ".join(missing))
+    st.stop()
+
+variance = get_variance(data_key, tables)
+orders = variance.orders
+
+col1, col2, col3 = st.columns(3)
+col1.metric("Work orders", f"{len(orders):,}")
+col2.metric("Orders with discrepancies", f"{int(orders['Discrepancy'].sum()):,}")
+col3.metric("Orders without exploded BOM", f"{len(variance.missing_bom):,}")
+
+# ===== ORDERS =====
+st.subheader("Work Orders")
+only_discrepancies = st.checkbox("Only orders with discrepancies", value=True)
+shown_orders = orders[orders['Discrepancy']] if only_discrepancies else orders
+st.dataframe(shown_orders, use_container_width=True)
+
+# ===== ONE ORDER =====
+if len(shown_orders):
+    order = st.selectbox("Order", shown_orders['Order'])
+    st.subheader(f"Exploded BOM and Consumption of Order {order}")
+    st.dataframe(variance.lines[variance.lines['Order'] == order], use_container_width=True)
+
+if len(variance.missing_bom):
+    with st.expander(f"⚠️ {len(variance.missing_bom)} orders have no exploded BOM for their material"):
+        st.write(variance.missing_bom)
+
+# the export is only written when requested, and reused for the same data and format
+render_export("work-order-variance-export-" + data_key, lambda: {'Orders': orders, 'Lines': variance.lines, 'Missing BOM': variance.missing_bom}, 'Work_Order_Variance')
@@ -0,0 +1,79 @@
+"""Pareto charts of the Forge failure tables, shared by the Avigilon pages.
+
+The Vega-Lite specs are built from core.pareto.pareto_table and cached by
+(upload hash, section, topN), so opening an expander again is a cache lookup.
+"""
+import altair as alt
+import streamlit as st
+
+from core.pareto import pareto_table
+
+
+def pareto_chart(df, model):
+    """Bars of the failure counts with the cumulative share line, for one model's pareto_table rows."""
+    base = alt.Chart(df).encode(
+        x = alt.X("combined:N", sort=alt.EncodingSortField(field='Rank', op='min'), axis=alt.Axis(labelAngle=360), title="Error Code / Quantity / Percentage"),
+    ).properties (
+        title=model
+    ).transform_calculate(
+        combined = "split(datum.Label, ' ')" # code, quantity and percentage on separate lines
+    )
+
+    # Create the bars with length encoded along the Y axis
+    bars = base.mark_bar(size = 25, color="#67B7D1").encode(
+        y = alt.Y("Qty:Q", title="Count", axis=alt.Axis(labels=False)),
+        tooltip=['Description']
+    )
+
+    # Create the line chart with length encoded along the Y axis
+    line = base.mark_line(strokeWidth = 1.5, color = "#cb4154"
+    ).encode(
+        y = alt.Y("Cumulative Share:Q", title="Cumulative Percentage", axis=alt.Axis(format=".1%")),
+    )
+
+    # Mark the percentage values on the line with Circle marks
+    points = base.mark_circle(strokeWidth = 3, color = "#cb4154"
+    ).encode(
+        y = alt.Y('Cumulative Share:Q', axis=None)
+    )
+
+    # Mark the Circle marks with the value text
+    point_text = points.mark_text(
+        align='left',
+        baseline='middle',
+        dx = -10,
+        dy = -10,
+        size = 12
+    ).encode(
+        y= alt.Y('Cumulative Share:Q', axis=None),
+        # we'll use the percentage as the text
+        text=alt.Text('Cumulative Share:Q', format="0.0%"),
+        color= alt.value("#cb4154")
+    )
+    # Layer all the elements together
+    return (bars + line + points + point_text).resolve_scale(
+        y = 'independent'
+    )
+
+
+# the failure table isn't hashed, the upload hash and section identify it
+@st.cache_data(max_entries=64)
+def pareto_specs(upload_key, section, top_n, _failures):
+    table = pareto_table(_failures, top_n)
+    table = table.astype({'Model': str})
+    return [(model, pareto_chart(df, model).to_dict()) for model, df in table.groupby('Model', sort=False)]
+
+
+def render_paretos(upload_key, section, failures, top_n=None):
+    """Pareto chart of every model of a failure table, in two columns."""
+    if len(failures) == 0:
+        return
+    specs = pareto_specs(upload_key, section, top_n, failures)
+    col1, col2 = st.columns(2)
+    half = (len(specs) + 1) // 2
+    with col1:
+        for model, spec in specs[:half]:
+            st.vega_lite_chart(spec, use_container_width=True)
+    with col2:
+        for model, spec in specs[half:]:
+            st.vega_lite_chart(spec, use_container_width=True)
@@ -0,0 +1,68 @@
+import os
+
+import pandas as pd
+
+from core.batch import detect_kind, main, run
+from core.watchguard import COLUMNS
+
+FORGE_REPORT = '''ReportTitle,a,b,c,d,e,f
+Forge Yield,,,91.2%,"Monday, January 09, 2023",,
+textbox1,,,,,,
+95.0%,100,95,5,,,
+report_group1,,,,,,
+M1,,50,48,2,96.0%,
+failuremode3,,,,,,
+E1: bad,M1,,2,,,
+'''
+
+
+def write_watchguard(path):
+    pd.DataFrame({
+        'Test Name': ['03/14/2022 08:15:02 run', '03/15/2022 09:00:00 run', '03/15/2022 09:00:00 run'],
+        'Product Category': ['Camera'] * 3,
+        'Product Test Type': ['Final', 'Run-In', 'Final'],
+        'Product Tested': ['A', 'A', 'PCBA-1'],
+        'Product Tested Description': ['WGA00356-100', 'WGA00356-100', 'WGA00356-100'],
+        'Qty Failed': [1, 0, 5],
+        'Qty Passed': [9, 10, 5],
+        'Test Category': ['Functional'] * 3,
+    })[COLUMNS].to_csv(path, index=False)
+
+
+def make_exports(directory):
+    os.makedirs(directory)
+    with open(os.path.join(directory, 'forge.csv'), 'w') as f:
+        f.write(FORGE_REPORT)
+    write_watchguard(os.path.join(directory, 'watchguard.csv'))
+    with open(os.path.join(directory, 'notes.md'), 'w') as f:
+        f.write('not an export')
+    return directory
+
+
+def test_detect_kind(tmp_path):
+    directory = make_exports(str(tmp_path / 'in'))
+    assert detect_kind(os.path.join(directory, 'forge.csv')) == 'forge'
+    assert detect_kind(os.path.join(directory, 'watchguard.csv')) == 'watchguard'
+    assert detect_kind(os.path.join(directory, 'notes.md')) is None
+
+
+def test_run_parquet(tmp_path):
+    input_dir, output_dir = make_exports(str(tmp_path / 'in')), str(tmp_path / 'out')
+    status = run(input_dir, output_dir, workers=1)
+    assert [(row['File'], row['Kind'], row['Error']) for row in status] == [('forge.csv', 'forge', ''), ('watchguard.csv', 'watchguard', '')]
+
+    summary = pd.read_parquet(os.path.join(output_dir, 'all.forge_summary.parquet'))
+    assert summary[['File', 'Section', 'Passed']].values.tolist() == [['forge.csv', 'Forge Set-Parameters', 95]]
+    rty = pd.read_parquet(os.path.join(output_dir, 'all.watchguard_rty.parquet')).set_index('Family')['RTY']
+    assert rty['HiFi Mic'] == 0.9 # the PCBA row is excluded, the Run-In row has a 100% yield
+    dropped_rows = pd.read_parquet(os.path.join(output_dir, 'watchguard.dropped_rows.parquet')).set_index('Rule')['Rows dropped']
+    assert dropped_rows['PCBA'] == 1
+    assert os.path.exists(os.path.join(output_dir, 'forge.pareto.parquet'))
+
+
+def test_main_xlsx(tmp_path, capsys):
+    input_dir, output_dir = make_exports(str(tmp_path / 'in')), str(tmp_path / 'out')
+    assert main([input_dir, '-o', output_dir, '--format', 'xlsx', '--workers', '1']) == 0
+    assert '2 of 2 files written' in capsys.readouterr().out
+    assert sorted(os.listdir(output_dir)) == ['all.xlsx', 'forge.xlsx', 'watchguard.xlsx']
+    assert list(pd.read_excel(os.path.join(output_dir, 'forge.xlsx'), sheet_name=None)) == ['summary', 'yields', 'failures', 'pareto']
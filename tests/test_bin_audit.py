@@ -0,0 +1,105 @@
+import sqlite3
+from datetime import date, datetime
+
+import pandas as pd
+import pytest
+
+from core.bin_audit import (BinAuditFilters, BinAuditSnapshot, InMemoryBinAuditBackend, SQLBinAuditBackend, SQLitePool,
+                            build_page_query, build_where, fetch_bin_audit, pooled_connection)
+
+ROWS = [
+    (datetime(2023, 1, 2, 8, 0), 'alice', 'P-100', 5, 'A1', 'OK'),
+    (datetime(2023, 1, 2, 9, 30), 'bob', 'P-200', 3, 'A2', 'MISSING'),
+    (datetime(2023, 1, 3, 23, 59), 'Alice', 'P-100', 1, 'B1', 'OK'),
+    (datetime(2023, 1, 4, 0, 0), 'carol', 'X-300', 7, 'B2', None),
+]
+
+
+def make_db(path, rows=ROWS):
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE INVENTORY_BIN_DATA ("WHEN" TIMESTAMP, PERSON TEXT, PART TEXT, QTY INTEGER, BIN TEXT, STATUS TEXT)')
+    connection.executemany('INSERT INTO INVENTORY_BIN_DATA VALUES (?, ?, ?, ?, ?, ?)', rows)
+    connection.commit()
+    connection.close()
+
+
+@pytest.fixture
+def pool(tmp_path):
+    path = str(tmp_path / 'bin_audit.db')
+    make_db(path)
+    return SQLitePool(path)
+
+
+def test_build_where_without_filters():
+    assert build_where(BinAuditFilters()) == ("", {})
+
+
+def test_build_where_binds_values():
+    where, params = build_where(BinAuditFilters(start=date(2023, 1, 2), end=date(2023, 1, 3), person=' ali ', status=('OK', 'MISSING')))
+    assert ':person' in where and 'alice' not in where # values are bound, never pasted into the SQL
+    assert params['person'] == '%ALI%'
+    assert params['start_date'] == datetime(2023, 1, 2)
+    assert params['end_date'] == datetime(2023, 1, 4) # end day is inclusive
+    assert params['status0'] == 'OK' and params['status1'] == 'MISSING'
+
+
+def test_build_page_query_sort_whitelist():
+    query, _ = build_page_query(BinAuditFilters(), sort_by='Part', descending=False)
+    assert 'ORDER BY PART ASC' in query
+    with pytest.raises(KeyError):
+        build_page_query(BinAuditFilters(), sort_by='PART; DROP TABLE INVENTORY_BIN_DATA')
+
+
+def test_build_page_query_paging():
+    query, params = build_page_query(BinAuditFilters(), page=2, page_size=50)
+    assert 'FETCH NEXT :row_limit ROWS ONLY' in query
+    assert params['row_offset'] == 100 and params['row_limit'] == 50
+    query, _ = build_page_query(BinAuditFilters(), dialect='sqlite')
+    assert 'LIMIT :row_limit OFFSET :row_offset' in query
+
+
+def test_fetch_bin_audit_in_chunks(pool):
+    df = fetch_bin_audit(pool.acquire(), arraysize=3)
+    assert len(df) == len(ROWS)
+    assert pd.api.types.is_datetime64_any_dtype(df['Date'])
+
+
+@pytest.mark.parametrize('filters, expected', [
+    (BinAuditFilters(), 4),
+    (BinAuditFilters(person='ALICE'), 2),
+    (BinAuditFilters(part='p-'), 3),
+    (BinAuditFilters(start=date(2023, 1, 3), end=date(2023, 1, 3)), 1),
+    (BinAuditFilters(status=('OK',)), 2),
+])
+def test_backends_agree(pool, filters, expected):
+    sql = SQLBinAuditBackend(pool)
+    memory = InMemoryBinAuditBackend(fetch_bin_audit(pool.acquire()))
+    assert sql.count(filters) == memory.count(filters) == expected
+    assert list(sql.export(filters, 'Date')['Date']) == list(memory.export(filters, 'Date')['Date'])
+
+
+def test_backends_page(pool):
+    sql = SQLBinAuditBackend(pool)
+    memory = InMemoryBinAuditBackend(fetch_bin_audit(pool.acquire()))
+    for backend in (sql, memory):
+        page = backend.page(BinAuditFilters(), 'Date', descending=True, page=1, page_size=3)
+        assert list(page['Person']) == ['alice'] # the oldest row is alone on the second page
+        assert len(backend.page(BinAuditFilters(), page=5, page_size=3)) == 0
+    assert sql.statuses() == memory.statuses() == ['MISSING', 'OK']
+
+
+def test_snapshot_syncs_only_new_rows(tmp_path, pool):
+    snapshot = BinAuditSnapshot(str(tmp_path / 'snapshot'))
+    with pooled_connection(pool) as connection:
+        first = snapshot.sync(connection)
+        assert first.new_rows == len(ROWS) and first.high_water == pd.Timestamp(2023, 1, 4)
+
+        connection.execute('INSERT INTO INVENTORY_BIN_DATA VALUES (?, ?, ?, ?, ?, ?)', (datetime(2023, 1, 5, 12, 0), 'dave', 'P-400', 2, 'C1', 'OK'))
+        connection.commit()
+        second = snapshot.sync(connection)
+        assert second.new_rows == 1
+        assert len(second.data) == len(ROWS) + 1
+        assert snapshot.sync(connection).new_rows == 0
+
+        assert len(BinAuditSnapshot(snapshot.directory).load()) == len(ROWS) + 1 # the parts on disk hold the same rows
+        assert len(snapshot.full_refresh(connection).data) == len(ROWS) + 1
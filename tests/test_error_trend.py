@@ -0,0 +1,45 @@
+import pandas as pd
+
+from core.error_trend import build_failure_cube, last_months, report_month, top_failures
+
+
+def failures(rows):
+    return pd.DataFrame(rows, columns=['Inspection Failures', 'Model', 'Qty'])
+
+
+CUBE = build_failure_cube({
+    '2023-01': failures([('E1: bad', 'M1', 5), ('E2: worse', 'M1', 7), ('E1: bad', 'M2', 1)]),
+    '2022-11': failures([('E1: bad', 'M1', 2)]),
+    '2022-12': failures([('E3: x', 'M1', 3)]),
+    '2022-09': failures([('E1: bad', 'M1', 9)]),
+})
+
+
+def test_report_month():
+    assert report_month('Monday, January 09, 2023') == '2023-01'
+    assert report_month('12/31/2022') == '2022-12'
+    assert report_month('not a date') is None
+    assert report_month(None) is None
+
+
+def test_months_are_chronological():
+    assert list(CUBE['Month'].cat.categories) == ['2022-09', '2022-11', '2022-12', '2023-01']
+    assert CUBE['Failure Code'].iloc[-1] == 'E1' # the text before ":"
+
+
+def test_last_months_is_a_calendar_window():
+    assert sorted(last_months(CUBE, 3)['Month'].unique()) == ['2022-11', '2022-12', '2023-01']
+    # October has no report, the 4 month window still stops at 2022-10
+    assert sorted(last_months(CUBE, 4)['Month'].unique()) == ['2022-11', '2022-12', '2023-01']
+    assert len(last_months(CUBE, 5)) == len(CUBE)
+    assert len(last_months(CUBE)) == len(CUBE)
+
+
+def test_last_months_across_the_year():
+    assert sorted(last_months(CUBE, 2)['Month'].unique()) == ['2022-12', '2023-01']
+    assert last_months(build_failure_cube({}), 3).empty
+
+
+def test_top_failures():
+    january = top_failures(CUBE[CUBE['Month'] == '2023-01'], 1)
+    assert list(zip(january['Model'], january['Failure Code'])) == [('M1', 'E2'), ('M2', 'E1')]
@@ -0,0 +1,65 @@
+import zipfile
+
+import pandas as pd
+import pytest
+
+from core import export
+from core.export import export_file, find_export, keyed_export
+
+ORDERS = pd.DataFrame({
+    'Order': ['1001', '1002', None],
+    'Qty': [1.5, None, 3.0],
+    'Date': pd.to_datetime(['2023-01-02', None, '2023-01-04']),
+})
+LINES = pd.DataFrame({'Order': ['1001'], 'Component': ['C1']})
+
+
+@pytest.fixture(autouse=True)
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, 'EXPORT_DIR', str(tmp_path))
+
+
+def test_excel(monkeypatch):
+    monkeypatch.setattr(export, 'CHUNK_ROWS', 2) # several chunks
+    path, extension, mime = export_file({'Orders': ORDERS, 'Lines': LINES}, 'Excel')
+    assert extension == '.xlsx' and mime == export.MIME_TYPES['Excel']
+    sheets = pd.read_excel(path, sheet_name=None, dtype={'Order': str})
+    assert list(sheets) == ['Orders', 'Lines']
+    assert sheets['Orders']['Order'].tolist()[:2] == ['1001', '1002'] and pd.isna(sheets['Orders']['Order'].iloc[2])
+    assert sheets['Orders']['Qty'].isna().tolist() == [False, True, False]
+
+
+def test_single_csv():
+    path, extension, _ = export_file({'Orders': ORDERS}, 'CSV')
+    assert extension == '.csv'
+    assert pd.read_csv(path)['Order'].isna().tolist() == [False, False, True]
+
+
+def test_several_tables_are_zipped():
+    path, extension, _ = export_file({'Orders': ORDERS, 'Lines': LINES}, 'Parquet')
+    assert extension == '.zip'
+    with zipfile.ZipFile(path) as archive:
+        assert sorted(archive.namelist()) == ['Lines.parquet', 'Orders.parquet']
+        with archive.open('Lines.parquet') as member:
+            pd.testing.assert_frame_equal(pd.read_parquet(member), LINES, check_dtype=False)
+
+
+def test_keyed_export_is_built_once():
+    calls = []
+
+    def build():
+        calls.append(1)
+        return {'Orders': ORDERS}
+
+    assert find_export('key') is None
+    first = keyed_export('key', build, 'CSV')
+    assert keyed_export('key', build, 'CSV') == first == find_export('key')
+    assert len(calls) == 1
+
+
+def test_parquet_keeps_missing_values(tmp_path):
+    mixed = pd.DataFrame({'Order': ['1001', None, 1003, float('nan')]})
+    path, _, _ = export_file({'Orders': mixed}, 'Parquet')
+    orders = pd.read_parquet(path)['Order']
+    assert orders.isna().tolist() == [False, True, False, True] # not 'None' / 'nan'
+    assert orders[2] == '1003'
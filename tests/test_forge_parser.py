@@ -0,0 +1,66 @@
+import io
+
+import pytest
+
+from core.forge_parser import SECTIONS, parse_forge_report, section_summary
+
+REPORT = '''ReportTitle,a,b,c,d,e,f
+Forge Yield,,,91.2%,"Monday, January 09, 2023",,
+textbox1,,,,,,
+95.0%,100,95,5,,,
+report_group1,,,,,,
+M1,,50,48,2,96.0%,
+M2,,50,47,3,94.0%,
+failuremode3,,,,,,
+E1: bad,M1,,2,,,
+"E2: worse, again",M2,,3,,,
+textbox2,,,,,,
+report_group2,,,,,,
+failuremode,,,,,,
+textbox3,,,,,,
+90.0%,"1,000",900,100,,,
+report_group3,,,,,,
+M1,C1,600,540,60,90.0%,
+M2,,400,360,40,90.0%,
+
+failuremode2,,,,,,
+E1: bad,M1,,40,,,
+E1: bad,M2,,40,,,
+'''
+
+
+@pytest.mark.parametrize('source', [REPORT.encode(), REPORT.replace('\n', '\r\n').encode(), io.BytesIO(REPORT.encode()), io.StringIO(REPORT)])
+def test_sources(source):
+    report = parse_forge_report(source)
+    assert (report.rty, report.report_date) == ('91.2%', 'Monday, January 09, 2023')
+    assert list(report.sections) == SECTIONS
+
+
+def test_sections():
+    sections = parse_forge_report(REPORT.encode()).sections
+    set_parameters = sections["Forge Set-Parameters"]
+    assert set_parameters.total.to_dict('records') == [{'Yield': '95.0%', 'Total': 100, 'Passed': 95, 'Failed': 5}]
+    assert list(set_parameters.yields.columns) == ['Model', 'Total', 'Passed', 'Failed', 'Yield'] # the blank Convert column is dropped
+    assert list(set_parameters.failures.columns) == ['Set-Parameters Failures', 'Model', 'Qty']
+    assert list(set_parameters.failures['Set-Parameters Failures']) == ['E1: bad', 'E2: worse, again']
+
+    inspection = sections["Forge Inspection"]
+    assert inspection.total['Total'].iloc[0] == 1000 # thousands separator
+    assert list(inspection.yields.columns) == ['Model', 'Convert', 'Total', 'Passed', 'Failed', 'Yield']
+    assert list(inspection.yields['Convert']) == ['C1', '']
+    assert inspection.failures['Qty'].dtype == 'int64'
+
+    burn_in = sections["Forge Burn-in"]
+    assert burn_in.total.empty and burn_in.yields.empty and burn_in.failures.empty
+    assert sections["Forge Base-Programming"].total.empty # sections missing from the file
+
+
+def test_section_summary():
+    summary = section_summary(parse_forge_report(REPORT.encode()).sections)
+    assert list(summary['Section']) == ["Forge Set-Parameters", "Forge Inspection"]
+    assert list(summary['Passed']) == [95, 900]
+
+
+def test_empty_report():
+    with pytest.raises(ValueError):
+        parse_forge_report(b'')
@@ -0,0 +1,30 @@
+import io
+
+from core.ingest import parse_files
+from core.parse_cache import ParseCache, content_key
+
+
+def upper(source):
+    return source.read().upper()
+
+
+def failing(source):
+    raise ValueError("bad file")
+
+
+def test_parse_files_in_order(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    files = [b'first', io.BytesIO(b'second'), b'first']
+    results = parse_files(files, 'upper', 1, upper, cache)
+    assert [result.result for result in results] == [b'FIRST', b'SECOND', b'FIRST']
+    assert [result.key for result in results] == [content_key(b'first', 'upper', 1), content_key(b'second', 'upper', 1), content_key(b'first', 'upper', 1)]
+
+    again = parse_files(files, 'upper', 1, upper, cache)
+    assert all(result.cached for result in again)
+    assert [result.key for result in again] == [result.key for result in results]
+
+
+def test_errors_are_reported_per_file(tmp_path):
+    results = parse_files([b'a'], 'failing', 1, failing, ParseCache(str(tmp_path)))
+    assert results[0].result is None and 'bad file' in results[0].error
+    assert results[0].key
@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.inventory import canonical_keys, canonical_quantities, reconcile
+
+SAP_DATA = pd.DataFrame({
+    'storage unit': ['SU1', 'su2 ', 'SU3', 123.0, 'x', None],
+    'material': ['M1', 'M2', 'M3', 'M4', 'M5', 'M6'],
+    'available stock': [1, 2, 3, 4, 'nine', 6],
+})
+PL_DATA = pd.DataFrame({
+    'hawb': ['SU1', 'SU2', 'SU3', '123', 'X', 'SU9'],
+    'sku': ['M1', 'M2', 'OTHER', 'M4', 'M5', 'M9'],
+    'movable unit label': [1, 5, 3, 4, 5, 9],
+    'carrier': ['a', 'b', 'c', 'd', 'e', 'f'],
+})
+
+
+def codes(df, column='storage_unit'):
+    return sorted(df[column].astype(str))
+
+
+def test_canonical_keys():
+    keys = canonical_keys(pd.Series([' ab ', 123.0, '', None, '0042']))
+    assert list(keys.fillna('<NA>')) == ['AB', '123', '<NA>', '<NA>', '0042']
+
+
+def test_canonical_quantities():
+    quantities, invalid = canonical_quantities(pd.Series([1, '2', 'nine', 2.5, None]))
+    assert list(invalid) == [False, False, True, True, False]
+    assert quantities.isna().tolist() == [False, False, True, True, True]
+
+
+def test_reconcile_codes():
+    result = reconcile(SAP_DATA, PL_DATA)
+    assert codes(result.matching_codes) == ['123', 'SU1', 'SU2', 'SU3', 'X']
+    assert codes(result.sap_only_codes) == []
+    assert codes(result.pl_only_codes) == ['SU9']
+    assert codes(result.sap_only_codes_material) == ['SU3']
+    assert codes(result.pl_only_codes_material) == ['SU3', 'SU9']
+
+
+def test_reconcile_quantities():
+    result = reconcile(SAP_DATA, PL_DATA)
+    assert codes(result.both) == ['123', 'SU1']
+    assert codes(result.sap_only) == ['SU2', 'SU3']
+    assert codes(result.quantity_mismatch) == ['SU2']
+    mismatch = result.quantity_mismatch.iloc[0]
+    assert (mismatch['sap_available_stock'], mismatch['3pl_available_stock']) == (2, 5)
+    assert list(result.pl_fixed['moveable unit label FIXED'].fillna(-1)) == [1, 2, -1, 4, -1, -1]
+    assert 'carrier' in result.pl_fixed.columns
+
+
+def test_unreadable_quantity_keeps_the_keys():
+    result = reconcile(SAP_DATA, PL_DATA)
+    assert 'X' in codes(result.matching_codes) # not a 3PL only code because the SAP quantity is unreadable
+    assert 'X' not in codes(result.quantity_mismatch)
+    assert 'X' not in codes(result.both)
+    invalid = result.invalid_rows
+    assert set(zip(invalid['column'], invalid['value'])) == {('available_stock', 'nine'), ('storage_unit', 'None')}
+
+
+def test_non_inventory():
+    non_inventory = pd.DataFrame({'storage_unit': ['su1', 'NI-7']})
+    result = reconcile(SAP_DATA, PL_DATA, non_inventory)
+    assert codes(result.ni_not_in_pl) == ['NI-7']
+    assert codes(result.pl_not_in_ni) == ['123', 'SU2', 'SU3', 'SU9', 'X']
+
+
+def test_reconcile_large_frame():
+    # 300k rows a side, all storage units distinct (the worst case for the key normalization)
+    rng = np.random.default_rng(0)
+    n = 300_000
+    storage_units = np.array([f"su{i:07d}" for i in range(n)], dtype=object)
+    materials = np.array([f"M{i}" for i in rng.integers(0, 5000, n)], dtype=object)
+    quantities = rng.integers(0, 100, n)
+    sap = pd.DataFrame({'storage unit': storage_units, 'material': materials, 'available stock': quantities})
+    order = rng.permutation(n)
+    pl_quantities = quantities[order].copy()
+    pl_quantities[:1000] += 1
+    pl = pd.DataFrame({'hawb': np.char.upper(storage_units[order].astype(str)), 'sku': materials[order], 'movable unit label': pl_quantities})
+
+    start = time.perf_counter()
+    result = reconcile(sap, pl)
+    seconds = time.perf_counter() - start
+
+    assert len(result.matching_codes) == n
+    assert len(result.quantity_mismatch) == 1000
+    assert len(result.both) == n - 1000
+    assert seconds < 10, f"reconcile took {seconds:.1f}s for {n:,} rows a side"
@@ -0,0 +1,93 @@
+import pytest
+
+from core.non_inventory import NonInventoryList, StaticSheetsClient
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FailingClient:
+    def modified_time(self, spreadsheet_id):
+        raise TimeoutError("timed out")
+
+    def values(self, spreadsheet_id, range_name):
+        raise TimeoutError("timed out")
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def make_list(client, tmp_path, clock, ttl=60):
+    return NonInventoryList(client, str(tmp_path / 'non_inventory.json'), ttl=ttl, clock=clock)
+
+
+def test_first_get_downloads(tmp_path, clock):
+    client = StaticSheetsClient([['SU1'], [], ['SU2']], modified_time='v1')
+    result = make_list(client, tmp_path, clock).get()
+    assert result.source == 'sheet'
+    assert list(result.data['storage_unit']) == ['SU1', 'SU2'] # empty rows are left out
+    assert client.downloads == 1
+
+
+def test_served_from_memory_within_ttl(tmp_path, clock):
+    client = StaticSheetsClient([['SU1']], modified_time='v1')
+    non_inventory = make_list(client, tmp_path, clock)
+    non_inventory.get()
+    clock.now += 30
+    assert non_inventory.get().source == 'memory'
+    assert client.downloads == 1
+
+
+def test_unchanged_sheet_is_not_downloaded_again(tmp_path, clock):
+    client = StaticSheetsClient([['SU1']], modified_time='v1')
+    non_inventory = make_list(client, tmp_path, clock)
+    non_inventory.get()
+    clock.now += 120
+    assert list(non_inventory.get().data['storage_unit']) == ['SU1']
+    assert client.downloads == 1
+
+    client.rows, client._modified_time = [['SU1'], ['SU3']], 'v2'
+    clock.now += 120
+    result = non_inventory.get()
+    assert result.source == 'sheet' and result.modified_time == 'v2'
+    assert list(result.data['storage_unit']) == ['SU1', 'SU3']
+    assert client.downloads == 2
+
+
+def test_force_downloads(tmp_path, clock):
+    client = StaticSheetsClient([['SU1']], modified_time='v1')
+    non_inventory = make_list(client, tmp_path, clock)
+    non_inventory.get()
+    non_inventory.get(force=True)
+    assert client.downloads == 2
+
+
+def test_snapshot_served_when_the_api_fails(tmp_path, clock):
+    make_list(StaticSheetsClient([['SU1']], modified_time='v1'), tmp_path, clock).get() # saves the snapshot
+
+    result = make_list(FailingClient(), tmp_path, clock).get()
+    assert result.source == 'snapshot'
+    assert 'timed out' in result.error
+    assert list(result.data['storage_unit']) == ['SU1']
+    assert result.fetched_at == 1000.0
+
+
+def test_unchanged_sheet_after_restart_uses_the_snapshot(tmp_path, clock):
+    make_list(StaticSheetsClient([['SU1']], modified_time='v1'), tmp_path, clock).get()
+    client = StaticSheetsClient([['SU1']], modified_time='v1')
+    result = make_list(client, tmp_path, clock).get()
+    assert list(result.data['storage_unit']) == ['SU1']
+    assert client.downloads == 0
+
+
+def test_no_snapshot_and_failing_api(tmp_path, clock):
+    result = make_list(FailingClient(), tmp_path, clock).get()
+    assert len(result.data) == 0
+    assert result.error
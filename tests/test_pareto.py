@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from core.pareto import pareto_table
+
+FAILURES = pd.DataFrame({
+    'Inspection Failures': ['E1: bad', 'E2: worse', 'E3: x', 'E1: bad', 'E4: y'],
+    'Model': ['M2', 'M2', 'M2', 'M1', 'M3'],
+    'Qty': [1, 3, '4', 2, 0],
+})
+
+
+def test_pareto_table():
+    df = pareto_table(FAILURES)
+    assert list(df['Model'].cat.categories) == ['M2', 'M1', 'M3'] # order of first appearance
+    m2 = df[df['Model'] == 'M2']
+    assert list(m2['Failure Code']) == ['E3', 'E2', 'E1']
+    assert list(m2['Rank']) == [0, 1, 2]
+    assert m2['Share'].tolist() == pytest.approx([0.5, 0.375, 0.125])
+    assert m2['Cumulative Share'].tolist() == pytest.approx([0.5, 0.875, 1.0])
+    assert m2['Label'].iloc[0] == 'E3 4 50.0%'
+    assert df.loc[df['Model'] == 'M3', 'Share'].tolist() == [0] # only zero counts
+
+
+def test_top_n_keeps_the_model_shares():
+    df = pareto_table(FAILURES, top_n=1)
+    assert list(df['Failure Code']) == ['E3', 'E1', 'E4']
+    assert df['Share'].iloc[0] == pytest.approx(0.5)
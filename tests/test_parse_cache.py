@@ -0,0 +1,77 @@
+import os
+import time
+
+import pandas as pd
+
+from core import parse_cache
+from core.forge_parser import ForgeSection
+from core.parse_cache import ParseCache, content_key
+
+
+class Parser:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, source):
+        self.calls += 1
+        frame = pd.DataFrame({'Model': ['M1', 'M2'], 'Qty': [len(source), 2]})
+        return {'section': ForgeSection(frame, frame.copy(), pd.DataFrame()), 'date': 'Monday'}
+
+
+def entries(cache):
+    return [name for name in os.listdir(cache.directory) if not name.startswith('.tmp-')]
+
+
+def test_content_key():
+    assert content_key(b'abc', 'forge', 1) == content_key(b'abc', 'forge', 1)
+    assert content_key(b'abc', 'forge', 1) != content_key(b'abc', 'forge', 2) # a version bump is a new entry
+    assert content_key(b'abc', 'forge', 1) != content_key(b'abd', 'forge', 1)
+
+
+def test_roundtrip_from_disk(tmp_path):
+    parse = Parser()
+    ParseCache(str(tmp_path)).get_or_parse(b'report', 'forge', 1, parse)
+
+    cache = ParseCache(str(tmp_path)) # a new process, nothing in memory
+    result = cache.get_or_parse(b'report', 'forge', 1, parse)
+    assert parse.calls == 1
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert isinstance(result['section'], ForgeSection)
+    pd.testing.assert_frame_equal(result['section'].total, parse(b'report')['section'].total)
+    assert result['section'].failures.empty and result['date'] == 'Monday'
+
+
+def test_other_content_is_parsed(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    parse = Parser()
+    cache.get_or_parse(b'report', 'forge', 1, parse)
+    cache.get_or_parse(b'other report', 'forge', 1, parse)
+    cache.get_or_parse(b'report', 'forge', 2, parse)
+    assert parse.calls == 3
+    assert len(entries(cache)) == 3
+
+
+def test_eviction_keeps_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(parse_cache, 'MEMORY_ENTRIES', 0) # every get goes to disk
+    cache = ParseCache(str(tmp_path))
+    cache.put('first', Parser()(b'first'))
+    entry_size = sum(entry.stat().st_size for entry in os.scandir(os.path.join(cache.directory, 'first')))
+    cache.max_bytes = 2 * entry_size
+
+    old = time.time() - 60
+    os.utime(os.path.join(cache.directory, 'first'), (old, old))
+    cache.put('second', Parser()(b'secnd'))
+    os.utime(os.path.join(cache.directory, 'second'), (old - 10, old - 10))
+    assert cache.get('first') is not None # marks first as recently used
+
+    cache.put('third', Parser()(b'third'))
+    assert sorted(entries(cache)) == ['first', 'third']
+    assert cache.get('second') is None
+
+
+def test_clear(tmp_path):
+    cache = ParseCache(str(tmp_path))
+    cache.put('key', Parser()(b'report'))
+    cache.clear()
+    assert entries(cache) == []
+    assert cache.get('key') is None
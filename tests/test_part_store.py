@@ -0,0 +1,22 @@
+import os
+
+import pandas as pd
+
+from core.part_store import PartStore
+
+
+def test_append_load_compact(tmp_path):
+    store = PartStore(str(tmp_path / 'parts'))
+    assert store.load() is None and store.parts() == [] and store.updated_at() is None
+
+    assert store.append(pd.DataFrame({'a': [1, 2]})) == 'part-00000.parquet'
+    assert store.append(pd.DataFrame({'a': [3]})) == 'part-00001.parquet'
+    assert store.load()['a'].tolist() == [1, 2, 3]
+
+    store.compact(store.load())
+    assert store.parts() == ['part-00002.parquet'] # numbering goes on after a compaction
+    assert store.load()['a'].tolist() == [1, 2, 3]
+    assert not any(name.endswith('.tmp') for name in os.listdir(store.directory))
+
+    store.clear()
+    assert store.load() is None
@@ -0,0 +1,85 @@
+import os
+
+from core import sap_ingest
+from core.sap_ingest import SapStore, detect_kind, parse_sap_export, parse_sap_list
+
+UNCONVERTED = '''Order Headers   10/18/2026
+
+------------------------------------------------------
+| Order   | Material | Delivered quantity (GMEIN) |
+------------------------------------------------------
+| 1001    | A1       |                        10  |
+| 1002    | A1       |                     1,234- |
+------------------------------------------------------
+| Order   | Material | Delivered quantity (GMEIN) |
+| 1003    | B9       |                         1  |
+'''
+
+
+def write(path, text, mtime=None):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+    return path
+
+
+def test_parse_unconverted_list():
+    df = parse_sap_list(UNCONVERTED)
+    assert list(df.columns) == ['Order', 'Material', 'Delivered quantity (GMEIN)']
+    assert list(df['Order']) == ['1001', '1002', '1003'] # rulers, title and the repeated header are dropped
+    assert df['Delivered quantity (GMEIN)'].iloc[1] == '1,234-'
+
+
+def test_parse_tab_list_with_repeated_heading():
+    df = parse_sap_list('Material\tComponent\tObject description\tObject description\nA1\tC1\tBoard\tMain\n')
+    assert list(df.columns) == ['Material', 'Component', 'Object description', 'Object description.1']
+
+
+def test_detect_kind():
+    assert detect_kind('coois_order_headers_2026.txt') == 'order_headers'
+    assert detect_kind('export.csv', ['Material', 'Component', 'Quantity']) == 'exploded_bom'
+    assert detect_kind('export.csv', ['Something']) is None
+
+
+def test_ingest_folder(tmp_path):
+    drop = tmp_path / 'drop'
+    drop.mkdir()
+    store = SapStore(str(tmp_path / 'store'))
+    write(drop / 'COOIS_Order_Headers_1.txt', UNCONVERTED, mtime=1000)
+    write(drop / 'unknown.csv', 'a,b\n1,2\n', mtime=1000)
+
+    results = store.ingest_folder(str(drop))
+    assert [(result.kind, result.rows) for result in results] == [('order_headers', 3), ('', 0)]
+    assert results[1].error
+    assert store.ingest_folder(str(drop)) == [] # unchanged files are not parsed again
+
+    # a later export of order 1002 wins
+    write(drop / 'COOIS_Order_Headers_2.txt', '| Order | Material | Delivered quantity (GMEIN) |\n| 1002 | A1 | 7 |\n', mtime=2000)
+    assert [result.rows for result in store.ingest_folder(str(drop))] == [1]
+    orders = store.load('order_headers').set_index('Order')
+    assert orders['Delivered quantity (GMEIN)'].to_dict() == {'1001': '10', '1002': '7', '1003': '1'}
+    assert store.updated_at('order_headers') is not None and store.updated_at('capacities') is None
+
+
+def test_recently_written_files_wait(tmp_path):
+    drop = tmp_path / 'drop'
+    drop.mkdir()
+    write(drop / 'COOIS_Order_Headers_1.txt', UNCONVERTED)
+    assert SapStore(str(tmp_path / 'store')).ingest_folder(str(drop), settle=60) == []
+
+
+def test_compaction(tmp_path, monkeypatch):
+    monkeypatch.setattr(sap_ingest, 'MAX_PARTS', 2)
+    store = SapStore(str(tmp_path / 'store'))
+    for i in range(3):
+        path = write(tmp_path / f'COOIS_Order_Headers_{i}.txt', f'| Order | Material | Delivered quantity (GMEIN) |\n| 100{i} | A1 | {i} |\n| 1009 | A1 | {i} |\n')
+        store.ingest_file(str(path))
+    assert len(os.listdir(tmp_path / 'store' / 'order_headers')) == 1
+    orders = store.load('order_headers').set_index('Order')
+    assert orders['Delivered quantity (GMEIN)'].to_dict() == {'1000': '0', '1001': '1', '1002': '2', '1009': '2'}
+
+
+def test_parse_csv_export(tmp_path):
+    df = parse_sap_export(str(write(tmp_path / 'bom.csv', 'Material, Component ,Quantity\n A1 ,C1,\n')))
+    assert df.to_dict('records') == [{'Material': 'A1', 'Component': 'C1', 'Quantity': ''}]
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.watchguard import COLUMNS, apply_exclusion_rules, classify_families, compute_family_yields, load_watchguard
+
+ROWS = [
+    # Product Tested, Product Tested Description
+    ('WGA00356-100', 'wga00356_100'),
+    ('PCBA-1', 'WGA00356-100'),
+    ('WGA00359-1', 'WGA00359-DWG'),
+    ('WGA00300-1', 'WGA00300-1'),
+    ('WGP-1', 'WGP-1'),
+    ('WGA00370-1', 'WGA00370-CS'),
+    ('WGA00370-2', 'wga00370_cs'), # only "-CS" is excluded, the _CS code is kept
+    ('WGA00383-1', None),
+    (None, 'WGA00383-1'),
+    ('WGA00450-1', 'WGA00450-WGP-DWG'), # counted under the first match in its text
+]
+
+
+def baseline(df):
+    # the filters of the original get_data_from_excel
+    df = df.copy()
+    df["Product Tested Description"] = df["Product Tested Description"].str.upper()
+    df = df[df["Product Tested"].str.contains("PCBA") == False]
+    df = df[df["Product Tested Description"].str.contains("DWG") == False]
+    df = df[df["Product Tested Description"].str.contains("WGA00300") == False]
+    df = df[df["Product Tested Description"].str.contains("WGP") == False]
+    df = df[df["Product Tested Description"].str.contains("-CS") == False]
+    df["Product Tested Description"] = df["Product Tested Description"].str.replace('_', '-')
+    return df
+
+
+def export(rows):
+    df = pd.DataFrame(rows, columns=['Product Tested', 'Product Tested Description'])
+    df['Test Name'] = '03/14/2022 08:15:02 run'
+    df['Product Category'] = 'Camera'
+    df['Product Test Type'] = 'Final'
+    df['Qty Failed'] = 0
+    df['Qty Passed'] = 1
+    df['Test Category'] = 'Functional'
+    return df[COLUMNS]
+
+
+def test_exclusion_counts():
+    df = export(ROWS)
+    df["Product Tested Description"] = df["Product Tested Description"].str.upper()
+    kept, counts = apply_exclusion_rules(df)
+    assert len(kept) == 2
+    assert counts.to_dict() == {
+        'PCBA': 1, 'Drawings (DWG)': 1, 'WGA00300 (discontinued)': 1, 'WGP': 2, '-CS codes': 1,
+        'Missing Product Tested': 1, 'Missing Product Tested Description': 1,
+    }
+
+
+def test_load_matches_the_baseline(tmp_path):
+    rng = np.random.default_rng(0)
+    rows = [ROWS[i] for i in rng.integers(0, len(ROWS), 2000)]
+    path = tmp_path / 'watchguard.csv'
+    export(rows).to_csv(path, index=False)
+
+    df, _, dropped_rows = load_watchguard(str(path))
+    expected = baseline(pd.read_csv(path, dtype={'Product Tested': str, 'Product Tested Description': str}))
+    assert list(df["Product Tested Description"]) == list(expected["Product Tested Description"])
+    assert 'WGA00370-CS' in set(df["Product Tested Description"])
+    assert dropped_rows.sum() == len(rows) - len(expected)
+
+
+def baseline_yields(df, family_desc_sheet):
+    # the per family loop of the original overall page
+    rty, final, run_in = {}, [], []
+    for family, codes in family_desc_sheet.items():
+        full_data = df.loc[df['Product Tested Description'].isin(codes)]
+        yield_by_prod = full_data.groupby(by=['Product Test Type', 'Product Tested', 'Product Tested Description'])[['Qty Failed', 'Qty Passed']].sum().reset_index()
+        yield_by_prod['Yield'] = yield_by_prod["Qty Passed"] / (yield_by_prod["Qty Passed"] + yield_by_prod["Qty Failed"])
+        rty[family] = yield_by_prod.loc[yield_by_prod['Yield'] != 0, 'Yield'].prod()
+        by_type = full_data.groupby(by=['Product Test Type'])[['Qty Failed', 'Qty Passed']].sum()
+        by_type = by_type["Qty Passed"] / (by_type["Qty Passed"] + by_type["Qty Failed"])
+        final += list(by_type[by_type.index == "Final"])
+        run_in += list(by_type[by_type.index == "Run-In"])
+    return rty, np.mean(final) * np.mean(run_in)
+
+
+def test_family_yields_match_the_baseline():
+    rng = np.random.default_rng(1)
+    n = 3000
+    codes = np.array(['WGA00356-100', 'WGA00508-1', 'WGA00359-2', 'WGA00370-CS', 'WGA00450-7', 'UNKNOWN-1'], dtype=object)
+    df = pd.DataFrame({
+        'Product Test Type': rng.choice(np.array(['Final', 'Run-In', 'Burn-In'], dtype=object), n),
+        'Product Tested': rng.choice(np.array(['A', 'B'], dtype=object), n),
+        'Product Tested Description': rng.choice(codes, n),
+        'Qty Failed': rng.integers(0, 3, n),
+        'Qty Passed': rng.integers(0, 20, n),
+    })
+    df.loc[df['Product Tested Description'] == 'WGA00450-7', 'Qty Passed'] = 0 # a 0 yield is left out of the RTY
+    df['Family'] = classify_families(df['Product Tested Description'])
+    family_desc_sheet = {family: list(codes) for family, codes in df.groupby('Family', observed=True)['Product Tested Description'].unique().items()}
+
+    yields = compute_family_yields(df)
+    rty, overall_rty = baseline_yields(df, family_desc_sheet)
+    assert set(yields.rty) == set(rty) == {'HiFi Mic', 'HiFi Base', '4RE Display', 'DV1'}
+    for family in rty:
+        assert yields.rty[family] == pytest.approx(rty[family])
+    assert yields.overall_rty == pytest.approx(overall_rty)
+    hifi = yields.by_product['HiFi Mic']
+    assert set(hifi['Product Tested Description']) == {'WGA00356-100', 'WGA00508-1'}
+    assert hifi['Yield'].dtype == 'float64'
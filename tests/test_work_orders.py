@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+
+from core.work_orders import consumption_variance, order_keys, parse_sap_quantity
+
+ORDERS = pd.DataFrame({
+    'Order': ['000001001', 1002, '1003'],
+    'Material': ['a1 ', 'A1', 'B9'],
+    'Delivered quantity (GMEIN)': ['10', '5', '1'],
+})
+BOM = pd.DataFrame({
+    'Material': ['A1', 'A1'],
+    'Component': ['C1', 'c2'],
+    'Quantity': ['2', '0.5'],
+})
+MOVEMENTS = pd.DataFrame({
+    'Order': ['1001', '1001', '1002', '1002'],
+    'Material': ['C1', 'C2', 'C1', 'C1'],
+    'Qty in UoE + sign (ERFME)': ['20-', '5-', '10-', '2'], # 1002 issued 10 C1 and reversed 2 of them
+})
+
+
+def test_parse_sap_quantity():
+    values = parse_sap_quantity(pd.Series(['1,234-', ' 5 ', 'n/a', None, '1,234-']))
+    assert values.tolist()[:2] == [-1234.0, 5.0]
+    assert values.isna().tolist() == [False, False, True, True, False]
+
+
+def test_order_keys():
+    assert order_keys(pd.Series(['000001222522', 1222522, '1222522 ', None])).tolist()[:3] == ['1222522'] * 3
+
+
+def test_consumption_variance():
+    result = consumption_variance(ORDERS, BOM, MOVEMENTS)
+    lines = result.lines.set_index(['Order', 'Component'])
+
+    # 1001: 20 C1 at 2 per unit and 5 C2 at 0.5 per unit both make the 10 delivered
+    assert lines.loc[('1001', 'C1'), 'Consumption'] == pytest.approx(10)
+    assert lines.loc[('1001', 'C2'), 'Consumption'] == pytest.approx(10)
+    # 1002: net 8 C1 is 4 units for 5 delivered, no C2 was moved at all
+    assert lines.loc[('1002', 'C1'), 'Input'] == pytest.approx(8)
+    assert lines.loc[('1002', 'C1'), 'Difference'] == pytest.approx(-1)
+    assert lines.loc[('1002', 'C2'), 'Difference'] == pytest.approx(-5)
+
+    orders = result.orders.set_index('Order')
+    assert orders['Discrepancy'].to_dict() == {'1001': False, '1002': True}
+    assert orders.loc['1002', 'Discrepant Components'] == 2
+    assert orders.loc['1002', 'Max Abs Difference'] == pytest.approx(5)
+    assert list(result.missing_bom['Order']) == ['1003']
+
+
+def test_movements_without_order_column():
+    result = consumption_variance(ORDERS.iloc[:1], BOM, MOVEMENTS[MOVEMENTS['Order'] == '1001'].drop(columns='Order'))
+    assert not result.orders['Discrepancy'].any()